@@ -0,0 +1,106 @@
+"""
+Benchmark of the call sequence execution.
+
+Executes random call sequences sharing their prefixes, as the generator emits them, once as a trie
+with the state snapshots of `RunnerBase.execute_sequences` and once naively, re-deploying the contract
+and re-executing every call of each sequence.
+
+Usage: PYTHONPATH=. python benchmarks/bench_call_sequences.py [sequences] [sequence length] [rounds]
+"""
+import os
+import random
+import sys
+import time
+
+import boa
+
+from fuzz.runners.runner_api import RunnerBase
+
+SERVICE_NAME = "opt_gas"
+CONFIG = "config_verifier_test.yml"
+
+SOURCE = """
+x: uint256
+y: DynArray[uint256, 10]
+
+@external
+def set_x(a: uint256):
+    self.x = a
+
+@external
+def push(a: uint256):
+    if len(self.y) == 10:
+        self.y = []
+    self.y.append(a + self.x)
+
+@external
+@view
+def total() -> uint256:
+    s: uint256 = self.x
+    for v in self.y:
+        s += v
+    return s
+"""
+
+
+class BenchRunner(RunnerBase):
+    def init_queue(self):
+        return None
+
+    def init_db(self):
+        return None
+
+    def execution_result(self, _contract, fn, _input_values, internal=False):
+        # the unpatched boa returns the decoded value only
+        res = getattr(_contract, fn)(*_input_values)
+        return self.compose_result(_contract, _contract._computation, res)
+
+
+def generate_sequences(functions, count, length):
+    sequences = []
+    for _ in range(count):
+        sequence = []
+        if sequences:
+            base = random.choice(sequences)
+            sequence = base[:random.randrange(len(base))]
+        while len(sequence) < length:
+            sequence.append([random.choice(functions), random.randrange(2)])
+        sequences.append(sequence)
+    return sequences
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    os.environ["SERVICE_NAME"] = SERVICE_NAME
+    random.seed(0)
+
+    runner = BenchRunner(CONFIG)
+    deployer = runner.compile(SOURCE)
+    input_values = {"set_x": [[1], [2]], "push": [[3], [4]], "total": [[], []]}
+    all_sequences = [generate_sequences(list(input_values), count, length) for _ in range(rounds)]
+    calls = count * length * rounds
+
+    start = time.perf_counter()
+    for sequences in all_sequences:
+        contract = deployer.deploy()
+        with boa.env.anchor():
+            runner.execute_sequences(contract, sequences, input_values)
+    trie = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for sequences in all_sequences:
+        for sequence in sequences:
+            contract = deployer.deploy()
+            for fn, i in sequence:
+                runner.call_result(contract, fn, input_values[fn][i])
+    naive = time.perf_counter() - start
+
+    print(f"{count} sequences of {length} calls, {rounds} rounds")
+    print(f"trie:  {calls / trie:.0f} executions/s")
+    print(f"naive: {calls / naive:.0f} executions/s, the trie is {naive / trie:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
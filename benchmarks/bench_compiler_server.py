@@ -0,0 +1,38 @@
+"""
+Micro-benchmark of the compiler server protocol.
+
+Spawns a compiler server and measures the round trip of a request without compilation work,
+which is the per-contract overhead of the in-process mode on top of the compilation and execution.
+
+Usage: PYTHONPATH=. python benchmarks/bench_compiler_server.py [iterations]
+"""
+import os
+import sys
+import time
+
+from fuzz.helpers.compiler_servers import CompilerServer
+
+SERVICE_NAME = "opt_gas"
+CONFIG = "config_verifier_test.yml"
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    os.environ["SERVICE_NAME"] = SERVICE_NAME
+
+    start = time.perf_counter()
+    server = CompilerServer({"name": SERVICE_NAME}, CONFIG)
+    server.request("ping")
+    print(f"start-up: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        server.request("ping")
+    total = time.perf_counter() - start
+    print(f"round trip: {total / iterations * 1e6:.1f} us/request ({iterations} iterations)")
+
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
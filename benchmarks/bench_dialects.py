@@ -0,0 +1,72 @@
+"""
+Benchmark of the cross-version source generation.
+
+Generates the `Vyper 0.4.0` and `Vyper 0.3.10` sources of the converter test cases once with a conversion
+per version, as `GeneratorDiff` used to, and once with a single `DialectConverter` conversion and the renderers.
+
+Usage: PYTHONPATH=. python benchmarks/bench_dialects.py [rounds]
+"""
+import os
+import random
+import sys
+import time
+
+from google.protobuf.json_format import Parse
+
+import fuzz.helpers.proto_loader as proto
+from fuzz.converters.dialects import DialectConverter
+from fuzz.converters.typed_converters import TypedConverter
+from fuzz.converters.typed_converters_4 import NaginiConverter
+
+CASES_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "cases")
+
+
+def load_messages():
+    messages = []
+    for case_name in sorted(os.listdir(CASES_DIR)):
+        with open(os.path.join(CASES_DIR, case_name, "in.json"), "r") as inp_json:
+            try:
+                messages.append(Parse(inp_json.read(), proto.Contract()))
+            except Exception:
+                continue
+    return messages
+
+
+def convert_per_version(msg):
+    sources = []
+    for converter in (NaginiConverter, TypedConverter):
+        conv = converter(msg)
+        conv.visit()
+        sources.append(conv.result)
+    return sources
+
+
+def convert_once(msg):
+    conv = DialectConverter(msg)
+    conv.visit()
+    return [conv.render("0.4.0"), conv.render("0.3.10")]
+
+
+def measure(generate, messages, rounds):
+    random.seed(1337)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for msg in messages:
+            generate(msg)
+    return time.perf_counter() - start
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages = load_messages()
+
+    per_version = measure(convert_per_version, messages, rounds)
+    once = measure(convert_once, messages, rounds)
+    contracts = rounds * len(messages)
+    print(f"conversion per version: {per_version:.2f} s, {contracts / per_version:.0f} contracts/s")
+    print(f"single conversion:      {once:.2f} s, {contracts / once:.0f} contracts/s")
+    print(f"speedup: {per_version / once:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the verifier comparison engine.
+
+Verifies a synthetic `run_results` entry of 5 compilers x 5 functions x 4 input strategies
+where all compilers agree, and optionally one where the last compiler diverges.
+
+Usage: PYTHONPATH=. python benchmarks/bench_verifier.py [iterations]
+"""
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+import yaml
+
+from fuzz.helpers.fingerprint import result_fingerprint
+from fuzz.verifiers.verifier_api import VerifierBase
+
+COMPILERS = 5
+FUNCTIONS = 5
+STRATEGIES = 4
+
+
+def make_config():
+    config = {
+        "compilers": [{"name": f"c{i}", "queue": "q", "exec_params": {}} for i in range(COMPILERS)],
+        "queues": {"q": {"host": "localhost", "port": 5672}},
+        "db": {"host": "localhost", "port": 27017},
+        "input_strategies": list(range(STRATEGIES)),
+        "verbosity": "ERROR",
+        "extra_flags": [],
+    }
+    fd, path = tempfile.mkstemp(suffix=".yml")
+    with os.fdopen(fd, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def make_call_result(seed):
+    result = {
+        "state": [str(seed * 7 + i) for i in range(10)],
+        "memory": "00" * 1280,
+        "consumed_gas": 21000 + seed,
+        "return_value": f"[{seed}, \"{'ab' * 16}\"]",
+    }
+    result["fingerprint"] = result_fingerprint(result)
+    return result
+
+
+def make_entry(diverging=False):
+    entry = {"generation_id": "bench"}
+    for c in range(COMPILERS):
+        deployment = {}
+        for f in range(FUNCTIONS):
+            seed = f * STRATEGIES
+            if diverging and c == COMPILERS - 1:
+                seed += 1
+            deployment[f"func_{f}"] = [make_call_result(seed + s) for s in range(STRATEGIES)]
+        entry[f"result_c{c}"] = [deployment]
+    return entry
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    config_path = make_config()
+    try:
+        verifier = VerifierBase(config_path)
+    finally:
+        os.remove(config_path)
+    logging.disable(logging.CRITICAL)
+
+    for name, entry in (("agreeing", make_entry()), ("diverging", make_entry(diverging=True))):
+        total = timeit.timeit(lambda: verifier.verify_result(entry), number=iterations)
+        print(f"{name}: {total / iterations * 1e6:.1f} us/entry ({iterations} iterations)")
+
+
+if __name__ == "__main__":
+    main()
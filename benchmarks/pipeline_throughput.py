@@ -0,0 +1,36 @@
+"""
+Measures the throughput of the distributed pipeline (generator -> runners -> verifier)
+from the verification results stored in the database, to be compared with the
+contracts/s reported by `fuzz/generators/run_inprocess.py`.
+
+Usage: PYTHONPATH=. python benchmarks/pipeline_throughput.py [window in minutes]
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+
+from fuzz.helpers.config import Config
+from fuzz.helpers.db import get_mongo_client
+
+
+def main():
+    window = timedelta(minutes=float(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    conf = Config()
+    db = get_mongo_client(conf.db["host"], conf.db["port"])
+
+    since = ObjectId.from_datetime(datetime.now(timezone.utc) - window)
+    verified = list(db["verification_results"].find({"_id": {"$gte": since}}, {"_id": 1}).sort("_id", 1))
+    generated = db["compilation_log"].count_documents({"_id": {"$gte": since}})
+    if len(verified) < 2:
+        print("Not enough verification results in the window")
+        return
+
+    elapsed = (verified[-1]["_id"].generation_time - verified[0]["_id"].generation_time).total_seconds()
+    print(f"generated: {generated} contracts, {generated / window.total_seconds():.2f} contracts/s")
+    print(f"verified: {len(verified)} contracts in {elapsed:.0f} s, "
+          f"{len(verified) / max(elapsed, 1):.2f} contracts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import re
+
+from .typed_converters import TypedConverter
+
+# Kinds of the dialect-specific constructs of the neutral source
+INIT_VISIBILITY = "init_visibility"
+NONREENTRANT = "nonreentrant"
+FOR_RANGE = "for_range"
+
+# NUL is never emitted by the converter, the string literals exclude it
+_PLACEHOLDER = re.compile("\x00(\\d+)\x00")
+# string literals are skipped while the operators are renamed, they contain no quotes
+_INT_DIV = re.compile(r'"[^"]*"|//')
+
+
+class DialectRenderer:
+    """
+    Renders the neutral source of `DialectConverter` for a vyper version.
+    The renderer of another version only implements the `render_<kind>` methods and `INT_DIV`.
+    """
+    INT_DIV = "//"
+
+    def render(self, source, nodes) -> str:
+        if self.INT_DIV != "//":
+            source = _INT_DIV.sub(lambda m: m.group(0) if m.group(0)[0] == '"' else self.INT_DIV, source)
+        return _PLACEHOLDER.sub(lambda m: self.render_node(*nodes[int(m.group(1))]), source)
+
+    def render_node(self, kind, args) -> str:
+        return getattr(self, f"render_{kind}")(*args)
+
+
+class Vyper0310Renderer(DialectRenderer):
+    INT_DIV = "/"
+
+    def render_init_visibility(self):
+        return "@external"
+
+    def render_nonreentrant(self, key):
+        return f'@nonreentrant("{key}")\n' if key else ""
+
+    def render_for_range(self, var_name, vyper_type, start, end, length):
+        if length is None:
+            return f"for {var_name} in range({start}, {end}):"
+        if end is None:
+            return f"for {var_name} in range({length}):"
+        return f"for {var_name} in range({start}, {end}+{length}):"
+
+
+class Vyper040Renderer(DialectRenderer):
+    def render_init_visibility(self):
+        return "@deploy"
+
+    # https://github.com/vyperlang/vyper/pull/3769
+    def render_nonreentrant(self, key):
+        return "@nonreentrant\n"
+
+    def render_for_range(self, var_name, vyper_type, start, end, length):
+        if length is None:
+            return f"for {var_name}: {vyper_type} in range({start}, {end}):"
+        if end is None:
+            return f"for {var_name}: {vyper_type} in range({length}):"
+        return f"for {var_name}: {vyper_type} in range({start}, {end}+{length}):"
+
+
+RENDERERS = {
+    "0.3.10": Vyper0310Renderer(),
+    "0.4.0": Vyper040Renderer(),
+}
+
+
+class DialectConverter(TypedConverter):
+    """
+    Walks the message once and emits a dialect-neutral source, so the sources of all vyper versions
+    share the random choices. The integer division is emitted as `//`, the other dialect-specific
+    constructs as placeholders of `nodes`, which are rendered by `render`.
+    """
+    # https://github.com/vyperlang/vyper/pull/2937
+    INT_BIN_OP_MAP = {**TypedConverter.BIN_OP_MAP, 3: "//"}
+
+    def __init__(self, msg):
+        super().__init__(msg)
+        self.nodes = []
+        self.INIT_VISIBILITY = self._placeholder(INIT_VISIBILITY)
+
+    def _placeholder(self, kind, *args):
+        self.nodes.append((kind, args))
+        return f"\x00{len(self.nodes) - 1}\x00"
+
+    def _visit_reentrancy(self, ret):
+        return self._placeholder(NONREENTRANT, self._reentrancy_key(ret))
+
+    def _format_for_statement(self, var_name, ivar_type, start, end=None, length=None):
+        return self._placeholder(FOR_RANGE, var_name, ivar_type.vyper_type, start, end, length)
+
+    def render(self, version) -> str:
+        return RENDERERS[version].render(self.result, self.nodes)
@@ -0,0 +1,95 @@
+"""
+Interval analysis of the integer expressions. The bounds are the values an expression may take at the runtime
+under the `Vyper` semantics, an operation provably reverts if no operand values within the bounds succeed.
+"""
+from fuzz.types_d.literal_value_generator import IntLiteralGen
+
+# the division operator differs between the dialects, both truncate toward zero
+DIVISIONS = ("/", "//")
+
+
+def type_bounds(int_type):
+    return IntLiteralGen._get_value_boundaries(int_type.n, int_type.signed)
+
+
+def bounds_of(folded, int_type):
+    """
+    :return: bounds of a `Folded` expression, the type bounds if nothing is known
+    """
+    return folded.bounds if folded.bounds is not None else type_bounds(int_type)
+
+
+def negation_bounds(bounds, int_type):
+    low, high = bounds
+    return _clip(-high, -low, int_type) or type_bounds(int_type)
+
+
+def conversion_bounds(bounds, int_type):
+    """
+    :return: bounds of the converted value, None if the conversion provably reverts
+    """
+    return _clip(bounds[0], bounds[1], int_type)
+
+
+def binop_bounds(left, op, right, int_type):
+    """
+    :param left: bounds of the left operand
+    :param right: bounds of the right operand
+    :return: bounds of the result, None if the operation provably reverts
+    """
+    al, ah = left
+    bl, bh = right
+    low, up = type_bounds(int_type)
+
+    if op == "+":
+        return _clip(al + bl, ah + bh, int_type)
+    if op == "-":
+        return _clip(al - bh, ah - bl, int_type)
+    if op == "*":
+        products = (al * bl, al * bh, ah * bl, ah * bh)
+        return _clip(min(products), max(products), int_type)
+    if op in DIVISIONS:
+        if bl == bh == 0 or al == ah == low < 0 and bl == bh == -1:
+            return None
+        if bl > 0 or bh < 0:
+            quotients = [_truncated_division(a, b) for a in (al, ah) for b in (bl, bh)]
+            return _clip(min(quotients), max(quotients), int_type)
+        magnitude = max(abs(al), abs(ah))
+        return _clip(-magnitude, magnitude, int_type)
+    if op == "%":
+        if bl == bh == 0:
+            return None
+        # the sign of the remainder follows the dividend
+        magnitude = max(abs(bl), abs(bh)) - 1
+        return (max(al, -magnitude) if al < 0 else 0), (min(ah, magnitude) if ah > 0 else 0)
+    if op == "**" and al >= 0 and bl >= 0:
+        lowest = 0 if al == 0 and bh > 0 else _bounded_power(al, bl, up)
+        return _clip(lowest, max(_bounded_power(ah, bh, up), 1), int_type)
+    if op == "&" and al >= 0 and bl >= 0:
+        return 0, min(ah, bh)
+    if op in ("|", "^") and al >= 0 and bl >= 0:
+        return 0, min((1 << max(ah, bh).bit_length()) - 1, up)
+    if op == ">>" and al >= 0 and bl >= 0:
+        return al >> bh, ah >> bl
+    return low, up
+
+
+def _clip(low, high, int_type):
+    type_low, type_up = type_bounds(int_type)
+    if high < type_low or low > type_up:
+        return None
+    return max(low, type_low), min(high, type_up)
+
+
+def _truncated_division(a, b):
+    quotient = abs(a) // abs(b)
+    return quotient if (a >= 0) == (b > 0) else -quotient
+
+
+def _bounded_power(base, exponent, up):
+    """
+    :return: the power or a value over `up` without computing the huge powers
+    """
+    if base > 1 and exponent * (base.bit_length() - 1) > up.bit_length():
+        return up + 1
+    return base ** exponent
@@ -5,6 +5,8 @@ from fuzz.helpers.config import MAX_STORAGE_VARIABLES, MAX_LIST_SIZE, MAX_FUNCTI
 from .func_tracker import FuncTracker
 from fuzz.types_d import Bool, Decimal, BytesM, Address, Bytes, Int, String, FixedList, DynArray
 from fuzz.types_d.base import BaseType
+from fuzz.types_d.folding import binary, literal, negate, opaque, parenthesize
+from .ranges import binop_bounds, bounds_of, conversion_bounds, negation_bounds
 from .var_tracker import VarTracker
 from .function_converter import FunctionConverter
 from .parameters_converter import ParametersConverter
@@ -118,8 +120,21 @@ class TypedConverter:
             "DA_FL_DECIMAL": (self._visit_list_expression, "ldecDyn"),
             "DA_FL_ADDRESS": (self._visit_list_expression, "ladrDyn"),
         }
+        # the operations provably reverting are steered away by the range analysis, otherwise only counted
+        self.range_analysis = True
+        self.range_stats = {"provable_reverts": 0, "steered": 0}
+        # bounds of the local integer variables: name -> (bounds, block level, loop depth) of the declaration,
+        # the storage variables and the inputs may take any value of their type
+        self._var_bounds = {}
+        # handlers folding the constants, the bounds of the converted integers are checked
+        self._fold_handlers = {
+            "INT": self._fold_int_expression,
+            "DECIMAL": self._fold_decimal_expression,
+        }
         self.result = ""
         self.function_inputs = {}
+        # output types of the external functions, the ones called by the runners
+        self.external_functions = {}
         self._var_tracker = VarTracker()
         self._func_tracker = FuncTracker(MAX_FUNCTIONS)
         self._block_level_count = 0
@@ -168,6 +183,8 @@ class TypedConverter:
             self._function_output = self._visit_output_parameters(func.output_params)
 
             self.function_inputs[func_obj._name] = types
+            if func_obj.visibility == proto.Func.Visibility.EXTERNAL:
+                self.external_functions[func_obj._name] = func_obj.output_parameters
             input_names.append(names)
             self.visit_func(func_obj, func)
 
@@ -263,17 +280,51 @@ class TypedConverter:
         handler, attr = self._expression_handlers[current_type.name]
         return handler(getattr(expr, attr))
 
+    def _visit_bounded_expression(self, expr, current_type):
+        """
+        :return: the expression and the bounds of its value, None unless an integer
+        """
+        if not isinstance(current_type, Int):
+            return self.visit_typed_expression(expr, current_type), None
+        _, attr = self._expression_handlers[current_type.name]
+        folded = self._fold_int_expression(getattr(expr, attr))
+        return folded.text, folded.bounds
+
+    def _variable_bounds(self, name):
+        entry = self._var_bounds.get(name)
+        # a variable of an outer block may be assigned later in the loop, by the previous iteration
+        if entry is None or entry[2] != self._for_block_count:
+            return None
+        return entry[0]
+
+    def _assign_bounds(self, name, bounds):
+        """
+        Tracks the bounds of an assigned local variable. Within a nested block the variable keeps the value
+        of the other paths after the join, the bounds are joined then; a loop may assign it any amount of times.
+        """
+        entry = self._var_bounds.get(name)
+        if entry is None:
+            return
+        previous, level, loops = entry
+        if loops != self._for_block_count or bounds is None or previous is None:
+            bounds = None
+        elif level < self._block_level_count:
+            bounds = min(previous[0], bounds[0]), max(previous[1], bounds[1])
+        self._var_bounds[name] = (bounds, level, loops)
+
     def __var_decl(self, expr, current_type):
         self.type_stack.append(current_type)
 
         idx = self._var_tracker.next_id(current_type)
 
-        value = self.visit_typed_expression(expr, current_type)
+        value, bounds = self._visit_bounded_expression(expr, current_type)
 
         var_name = f"x_{current_type.name}_{str(idx)}"
         result = var_name + ": " + current_type.vyper_type
 
         self._var_tracker.register_function_variable(var_name, self._block_level_count, current_type, True)
+        if isinstance(current_type, Int):
+            self._var_bounds[var_name] = (bounds, self._block_level_count, self._for_block_count)
         result = f"{result} = {value}"
 
         self.type_stack.pop()
@@ -321,6 +372,10 @@ class TypedConverter:
         return f"func_{_id}"
 
     def _visit_reentrancy(self, ret):
+        key = self._reentrancy_key(ret)
+        return f'@nonreentrant("{key}")\n' if key else ""
+
+    def _reentrancy_key(self, ret):
         # https://github.com/vyperlang/vyper/blob/55e18f6d128b2da8986adbbcccf1cd59a4b9ad6f/vyper/ast/nodes.py#L878
         # https://github.com/vyperlang/vyper/blob/55e18f6d128b2da8986adbbcccf1cd59a4b9ad6f/vyper/ast/identifiers.py#L8
         result = ""
@@ -336,7 +391,7 @@ class TypedConverter:
 
             result += c
 
-        return f'@nonreentrant("{result}")\n' if result and result.lower() not in RESERVED_KEYWORDS else ""
+        return result if result.lower() not in RESERVED_KEYWORDS else ""
 
     def __get_mutability(self, mut):
         return self.MUTABILITY_MAPPING[max(self._mutability_level, mut)]
@@ -529,7 +584,8 @@ class TypedConverter:
         if result is None:
             result = self.__var_decl(assignment.expr, current_type)
             return result
-        expression_result = self.visit_typed_expression(assignment.expr, current_type)
+        expression_result, bounds = self._visit_bounded_expression(assignment.expr, current_type)
+        self._assign_bounds(result, bounds)
         result = f"{self.code_offset}{result} = {expression_result}"
         self.type_stack.pop()
         return result
@@ -608,6 +664,7 @@ class TypedConverter:
             if len(allowed_vars) > 0:
                 variable = random.choice(allowed_vars)
             if variable is not None and variable not in output_vars:
+                self._assign_bounds(variable, None)
                 global_vars = self._var_tracker.get_global_vars(t)
                 if variable in global_vars and self._mutability_level < NON_PAYABLE:
                     self._mutability_level = NON_PAYABLE
@@ -711,7 +768,7 @@ class TypedConverter:
 
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
-            return convert_expr
+            return convert_expr.text
         return self.create_literal(expr.lit)
 
     def visit_create_min_proxy_or_copy_of(self, cmp, name):
@@ -834,46 +891,90 @@ class TypedConverter:
 
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
-            return convert_expr
+            return convert_expr.text
         return self.create_literal(expr.lit)
 
     def _visit_int_expression(self, expr):
+        return self._fold_int_expression(expr).text
+
+    def _fold_int_expression(self, expr):
+        """
+        :return: `Folded` expression, the constants are folded to check the bounds
+        """
         current_type = self.type_stack[len(self.type_stack) - 1]
 
         if expr.HasField("binOp"):
             bin_op = get_bin_op(expr.binOp.op, self.INT_BIN_OP_MAP)
             self.op_stack.append(bin_op)
-            left = self._visit_int_expression(expr.binOp.left)
-            right = self._visit_int_expression(expr.binOp.right)
-
-            left, bin_op, right = current_type.check_binop_bounds(left, bin_op, right)
-            result = f"{left} {bin_op} {right}"
+            stats = dict(self.range_stats)
+            left = self._fold_int_expression(expr.binOp.left)
+            left_stats = {key: count - stats[key] for key, count in self.range_stats.items()}
+            right = self._fold_int_expression(expr.binOp.right)
+
+            checked_left, bin_op, right = current_type.check_binop_bounds(left, bin_op, right)
+            # the operations of a replaced left operand aren't in the source
+            if checked_left is not left:
+                for key, count in left_stats.items():
+                    self.range_stats[key] -= count
+            left = checked_left
+            bin_op, right, bounds = self._check_binop_range(current_type, left, bin_op, right)
+            result = current_type.fold_binop(left, bin_op, right)
+            result.bounds = bounds
             result = current_type.check_literal_bounds(result)
 
             self.op_stack.pop()
             if len(self.op_stack) > 0:
-                result = f"({result})"
+                result = parenthesize(result)
             return result
         if expr.HasField("unOp"):
             self.op_stack.append("unMinus")
-            result = self._visit_int_expression(expr.unOp.expr)
+            result = self._fold_int_expression(expr.unOp.expr)
             self.op_stack.pop()
             if current_type.signed:
-                result = f"-{result}"
+                bounds = negation_bounds(bounds_of(result, current_type), current_type)
+                result = negate(result)
+                result.bounds = bounds
                 result = current_type.check_literal_bounds(result)
                 if len(self.op_stack) > 0:
-                    result = f"({result})"
+                    result = parenthesize(result)
             return result
         if expr.HasField("varRef"):
             result = self._visit_var_ref(expr.varRef, self._block_level_count)
             if result is not None:
+                result = opaque(result)
+                result.bounds = self._variable_bounds(result.text)
                 return result
 
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
             return convert_expr
 
-        return self.create_literal(expr.lit)
+        return literal(self.create_literal(expr.lit))
+
+    def _check_binop_range(self, current_type, left, bin_op, right):
+        """
+        Steers the operation away if it reverts for any values of the operands within their bounds,
+        the operations of the constants are checked by `Int`
+        :return: the operation, the right operand and the bounds of the result
+        """
+        left_bounds = bounds_of(left, current_type)
+        right_bounds = bounds_of(right, current_type)
+        bounds = binop_bounds(left_bounds, bin_op, right_bounds, current_type)
+        if bounds is not None or left.value is not None and right.value is not None:
+            return bin_op, right, bounds
+
+        self.range_stats["provable_reverts"] += 1
+        if not self.range_analysis:
+            return bin_op, right, None
+        self.range_stats["steered"] += 1
+        division = self.INT_BIN_OP_MAP[3]
+        alternative = {"+": "-", "-": "+", "*": division, "**": "*"}.get(bin_op)
+        if alternative is not None:
+            bounds = binop_bounds(left_bounds, alternative, right_bounds, current_type)
+            if bounds is not None:
+                return alternative, right, bounds
+        # the division by one keeps the left operand
+        return division, literal("1"), left_bounds
 
     # TODO: make conditions prettier somehow
     def _visit_conversion(self, expr, current_type):
@@ -932,14 +1033,26 @@ class TypedConverter:
         return None
 
     def __visit_conversion(self, message, current_type, input_type, check_bounds=False):
-        handler, _ = self._expression_handlers[input_type.name]
+        """
+        :return: `Folded` conversion, the bounds of the numbers converted to integers are kept
+        """
         self.type_stack.append(input_type)
-        result = handler(message)
+        bounds = None
+        if check_bounds:
+            folded = current_type.check_literal_bounds(self._fold_handlers[input_type.name](message))
+            result = folded.text
+            if folded.bounds is not None or isinstance(input_type, Int):
+                bounds = conversion_bounds(bounds_of(folded, input_type), current_type)
+                if bounds is None:
+                    self.range_stats["provable_reverts"] += 1
+        else:
+            handler, _ = self._expression_handlers[input_type.name]
+            result = handler(message)
         self.type_stack.pop()
 
-        if check_bounds:
-            result = current_type.check_literal_bounds(result)
-        return f"convert({result}, {current_type.vyper_type})"
+        converted = opaque(f"convert({result}, {current_type.vyper_type})")
+        converted.bounds = bounds
+        return converted
 
     def _visit_bytes_m_expression(self, expr):
         current_type = self.type_stack[len(self.type_stack) - 1]
@@ -963,7 +1076,7 @@ class TypedConverter:
                 return result
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
-            return convert_expr
+            return convert_expr.text
         return self.create_literal(expr.lit)
 
     def _visit_hash256(self, expr, name):
@@ -985,34 +1098,37 @@ class TypedConverter:
         return f"{result}{value})"
 
     def _visit_decimal_expression(self, expr):
+        return self._fold_decimal_expression(expr).text
+
+    def _fold_decimal_expression(self, expr):
         if expr.HasField("binOp"):
             bin_op = get_bin_op(expr.binOp.op, self.DECIMAL_BIN_OP_MAP)
             self.op_stack.append(bin_op)
-            left = self._visit_decimal_expression(expr.binOp.left)
-            right = self._visit_decimal_expression(expr.binOp.right)
-            result = f"{left} {bin_op} {right}"
+            left = self._fold_decimal_expression(expr.binOp.left)
+            right = self._fold_decimal_expression(expr.binOp.right)
+            result = binary(left, bin_op, right)
             self.op_stack.pop()
             if len(self.op_stack) > 0:
-                result = f"({result})"
+                result = parenthesize(result)
             return result
         if expr.HasField("unOp"):
             self.op_stack.append("unMinus")
-            result = self._visit_decimal_expression(expr.unOp.expr)
-            result = f"-{result}"
+            result = self._fold_decimal_expression(expr.unOp.expr)
+            result = negate(result)
             self.op_stack.pop()
             if len(self.op_stack) > 0:
-                result = f"({result})"
+                result = parenthesize(result)
             return result
         if expr.HasField("varRef"):
             result = self._visit_var_ref(expr.varRef, self._block_level_count)
             if result is not None:
-                return result
+                return opaque(result)
         current_type = self.type_stack[-1]
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
             return convert_expr
 
-        return self.create_literal(expr.lit)
+        return literal(self.create_literal(expr.lit))
 
     def _visit_bytes_expression(self, expr):
         current_type = self.type_stack[len(self.type_stack) - 1]
@@ -1029,7 +1145,7 @@ class TypedConverter:
 
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
-            return convert_expr
+            return convert_expr.text
 
         return self.create_literal(expr.lit)
 
@@ -1043,7 +1159,7 @@ class TypedConverter:
         current_type = self.type_stack[-1]
         convert_expr = self._visit_conversion(expr, current_type)
         if convert_expr is not None:
-            return convert_expr
+            return convert_expr.text
 
         return f"\"{self.create_literal(expr.lit)}\""
 
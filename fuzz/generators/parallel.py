@@ -0,0 +1,115 @@
+import multiprocessing
+import queue
+import time
+
+
+def run_worker(generator, index, persistence, failure_classes):
+    """
+    Fuzzing worker forked from the generator, the records are handed over to the persistence process
+    """
+    generator.persistence = persistence
+    generator.worker_index = index
+    generator.shared_failure_classes = failure_classes
+    generator.fuzzed_inputs = 0
+    generator.stats_started = generator.stats_reported = time.monotonic()
+
+    import sys
+    import atheris
+    import atheris_libprotobuf_mutator
+    import fuzz.helpers.proto_loader as proto
+
+    atheris_libprotobuf_mutator.Setup(sys.argv, generator.fuzz_one, proto=proto.Contract)
+    atheris.Fuzz()
+
+
+class ParallelSupervisor:
+    """
+    Runs the fuzzing workers over the shared corpus, the engine of each worker reloads the inputs found by
+    the others. The supervisor is the persistence process: it owns the database and the queue connections,
+    batches the writes of the workers, ingests the coverage feedback and logs the exec/s.
+    A crashed worker is replaced.
+    """
+
+    def __init__(self, generator, workers):
+        self.generator = generator
+        self.workers = workers
+        self.conf = generator.conf.generator
+        self.batch_size = self.conf.get("persistence_batch_size", 100)
+        self.flush_interval = self.conf.get("flush_interval", 1.0)
+        self.context = multiprocessing.get_context("fork")
+        self.persistence = self.context.Queue()
+        # failure classes by the worker publishing them, shared when the workers start
+        self.manager = None
+        self.failure_classes = None
+        self.processes = {}
+        # inputs fuzzed and elapsed seconds by worker
+        self.stats = {}
+        # batch of the records and the messages of the contracts
+        self.contracts = []
+        self.flushed = self.stats_logged = time.monotonic()
+
+    def start_worker(self, index):
+        process = self.context.Process(target=run_worker,
+                                       args=(self.generator, index, self.persistence, self.failure_classes),
+                                       daemon=True)
+        process.start()
+        self.processes[index] = process
+
+    def init_failure_classes(self):
+        """
+        A failure class is published once across the workers, the classes are kept by a manager process
+        """
+        self.manager = self.context.Manager()
+        self.failure_classes = self.manager.dict()
+
+    def run(self):
+        self.init_failure_classes()
+        for index in range(self.workers):
+            self.start_worker(index)
+        self.generator.logger.info("Started %s fuzzing workers", self.workers)
+        while True:
+            self.step()
+
+    def step(self):
+        """
+        Takes an item of the workers and flushes the batch when it's full or old enough
+        """
+        try:
+            kind, payload = self.persistence.get(timeout=self.flush_interval)
+        except queue.Empty:
+            kind, payload = None, None
+        if kind == self.generator.CONTRACT:
+            self.contracts.append(payload)
+        elif kind == self.generator.FAILURE:
+            self.generator.failure_log.insert_one(payload)
+        elif kind == self.generator.STATS:
+            index, inputs, elapsed = payload
+            self.stats[index] = (inputs, elapsed)
+
+        now = time.monotonic()
+        if len(self.contracts) >= self.batch_size or (self.contracts and now - self.flushed >= self.flush_interval):
+            self.generator.write_contracts(self.contracts)
+            self.contracts = []
+            self.flushed = now
+
+        if now - self.stats_logged >= self.generator.stats_interval:
+            self.stats_logged = now
+            self.log_stats()
+            self.restart_workers()
+            if self.generator.feedback_corpus:
+                self.generator.ingest_coverage_feedback()
+
+    def restart_workers(self):
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                self.generator.logger.warning("Worker %s exited with code %s, restarting", index, process.exitcode)
+                self.start_worker(index)
+
+    def log_stats(self):
+        total = 0.0
+        for index in sorted(self.stats):
+            inputs, elapsed = self.stats[index]
+            rate = inputs / elapsed if elapsed > 0 else 0.0
+            total += rate
+            self.generator.logger.info("Worker %s: %s inputs fuzzed, %.1f exec/s", index, inputs, rate)
+        self.generator.logger.info("%s workers: %.1f exec/s", len(self.stats), total)
@@ -1,21 +1,41 @@
 import sys
+import os
 import json
+import hashlib
 import logging
+import random
+import time
 
-import atheris
-import atheris_libprotobuf_mutator
-from google.protobuf.json_format import MessageToJson
+from bson.objectid import ObjectId
+from google.protobuf import text_format
+from google.protobuf.json_format import MessageToJson, Parse
 
 from fuzz.helpers.config import Config
 from fuzz.helpers.db import get_mongo_client
+from fuzz.helpers.calldata import encode_calldata
 from fuzz.generators.input_generation import InputGenerator, InputStrategy
 from fuzz.helpers.json_encoders import ExtendedEncoder
 from fuzz.helpers.queue_managers import QueueManager, MultiQueueManager
+from fuzz.verifiers.clustering import normalize_message
 
 import fuzz.helpers.proto_loader as proto
 
 
 class GeneratorBase:
+    # Compile modes of the generated sources
+    # the sources aren't compiled and are all published
+    COMPILE_NONE = "none"
+    # the semantic analysis only
+    COMPILE_CHECK = "check"
+    # the full compilation stored in `compilation_result`
+    COMPILE_FULL = "full"
+
+    # Items handed over to the persistence process in the parallel mode
+    CONTRACT = "contract"
+    FAILURE = "failure"
+    STATS = "stats"
+    # Seconds between the logged fuzzing statistics
+    DEFAULT_STATS_INTERVAL = 60
 
     # Add new converters if necessary into new variables
     def __init__(self, proto_converter, config_file=None):
@@ -27,12 +47,69 @@ class GeneratorBase:
         self.init_db()
         self.init_queue()
         self.init_input_generator()
+        self.init_compile_mode()
+        self.init_feedback()
+        self.init_raw_calldata()
+        self.init_call_sequences()
+        self.init_parallel()
+        self.init_range_analysis()
 
     def start_generator(self):
+        if self.workers > 1:
+            from fuzz.generators.parallel import ParallelSupervisor
+            ParallelSupervisor(self, self.workers).run()
+            return
+
+        # the fuzzing engine is not required to replay messages
+        import atheris
+        import atheris_libprotobuf_mutator
+
         atheris_libprotobuf_mutator.Setup(
-            sys.argv, self.TestOneProtoInput, proto=proto.Contract)
+            sys.argv, self.fuzz_one, proto=proto.Contract)
         atheris.Fuzz()
 
+    def fuzz_one(self, msg):
+        self.fuzzed_inputs += 1
+        # the persistence process ingests the feedback in the parallel mode
+        if self.feedback_corpus and self.persistence is None and self.fuzzed_inputs % self.feedback_interval == 0:
+            self.ingest_coverage_feedback()
+        self.TestOneProtoInput(msg)
+
+        now = time.monotonic()
+        if now - self.stats_reported >= self.stats_interval:
+            self.stats_reported = now
+            self.report_stats(now)
+
+    def report_stats(self, now):
+        elapsed = now - self.stats_started
+        self.logger.info("%s integer operations provably reverting, %s steered by the range analysis",
+                         self.range_stats["provable_reverts"], self.range_stats["steered"])
+        if self.persistence is not None:
+            self.persistence.put((self.STATS, (self.worker_index, self.fuzzed_inputs, elapsed)))
+            return
+        self.logger.info("%s inputs fuzzed, %.1f exec/s", self.fuzzed_inputs, self.fuzzed_inputs / elapsed)
+
+    def ingest_coverage_feedback(self):
+        """
+        Writes the inputs which reached a new coverage in the runners into the corpus directory,
+        the fuzzing engine reloads the corpus periodically and prioritizes them for mutations
+        """
+        query = {} if self.feedback_cursor is None else {"_id": {"$gt": self.feedback_cursor}}
+        ingested = 0
+        for entry in self.coverage_feedback.find(query, {"json_msg": 1}).sort("_id", 1):
+            self.feedback_cursor = entry["_id"]
+            msg = Parse(entry["json_msg"], proto.Contract())
+            data = text_format.MessageToString(msg).encode()
+            # the corpus entries are named by the content hash as the engine does
+            path = os.path.join(self.feedback_corpus, hashlib.sha1(data).hexdigest())
+            if os.path.exists(path):
+                continue
+            with open(path, "wb") as f:
+                f.write(data)
+            ingested += 1
+        if ingested:
+            self.logger.info("Ingested %s inputs with a new runner coverage", ingested)
+
     def TestOneProtoInput(self, msg):
         # For diff fuzzing add generation_result_{name}
         data = {
@@ -48,36 +125,70 @@ class GeneratorBase:
         # For diff fuzzing other compiler results
         data["generation_result"] = proto_converter.result
 
-        # Must be overridden
-        c_result, c_error = self.compile_source(proto_converter.result)
-        if c_error is None:
-            data["compilation_result"] = c_result
-        else:
-            data["error_type"] = type(c_error).__name__
-            data["error_message"] = str(c_error)
+        c_result, c_error = self.compile(proto_converter.result)
+        self.record_compilation(data, c_result, c_error)
 
         self.logger.debug("Compilation result: %s", data)
 
-        input_values = self.generate_inputs(proto_converter.function_inputs)
+        values = self.generate_input_values(proto_converter.function_inputs)
+        input_values = json.dumps(values, cls=ExtendedEncoder)
         self.logger.debug("Generated inputs: %s", input_values)
         data["function_input_values"] = input_values
+        data["function_calldata"] = self.generate_calldata(proto_converter, values)
+        data["call_sequences"] = self.generate_sequences(proto_converter.external_functions)
 
-        insert = self.compilation_log.insert_one(data)
+        data["published"] = self.should_publish(c_error)
+        # the id is known before the record is stored, the persistence is batched in the parallel mode
+        data["_id"] = ObjectId()
+        if not data["published"]:
+            self.persist(data, None)
+            return
 
         # For diff fuzzing add the results
         message = {
-            "_id": str(insert.inserted_id),
+            "_id": str(data["_id"]),
             "generation_result": proto_converter.result,
             "function_input_values": input_values,
+            "function_calldata": data["function_calldata"],
+            "call_sequences": data["call_sequences"],
             "json_msg": MessageToJson(msg),
             "generator_version": self.__version__,
         }
-        self.qm.publish(**message)
+        self.persist(data, message)
+
+    def persist(self, record, message):
+        """
+        Stores the record of a generated contract and publishes its message to the runners,
+        the workers of the parallel mode hand them over to the persistence process
+        :param message: the message of the runners, None if the contract isn't published
+        """
+        if self.persistence is not None:
+            self.persistence.put((self.CONTRACT, (record, message)))
+            return
+        self.write_contracts([(record, message)])
 
-        # Creating the result entry, so there's no race condition in runners
-        self.run_results.insert_one({'generation_id': str(insert.inserted_id)})
+    def write_contracts(self, contracts):
+        self.compilation_log.insert_many([record for record, _ in contracts], ordered=False)
+        messages = [message for _, message in contracts if message is not None]
+        if len(messages) == 0:
+            return
+        # Creating the result entries first, so there's no race condition in runners
+        self.run_results.insert_many([{'generation_id': message["_id"]} for message in messages], ordered=False)
+        for message in messages:
+            self.qm.publish(**message)
+
+    def log_failure(self, failure):
+        if self.persistence is not None:
+            self.persistence.put((self.FAILURE, failure))
+            return
+        self.failure_log.insert_one(failure)
 
     def generate_inputs(self, function_inputs):
+        input_values = self.generate_input_values(function_inputs)
+        input_values = json.dumps(input_values, cls=ExtendedEncoder)
+        return input_values
+
+    def generate_input_values(self, function_inputs) -> dict:
         input_values = dict()
         for name, types in function_inputs.items():
             for i in self.conf.input_strategies:
@@ -86,10 +197,104 @@ class GeneratorBase:
                 if input_values.get(name, None) is None:
                     input_values[name] = []
                 input_values[name].append(self.input_generator.generate(types))
-
-        input_values = json.dumps(input_values, cls=ExtendedEncoder)
         return input_values
 
+    def generate_sequences(self, functions):
+        """
+        Generates the random sequences of the external function calls. A sequence extends a random prefix
+        of a previous sequence, so the runners execute the shared prefixes once.
+        :return: JSON of the sequences of [function name, input strategy index], None if disabled
+        """
+        if self.call_sequences == 0 or len(functions) == 0:
+            return None
+        functions = sorted(functions)
+        sequences = []
+        for _ in range(self.call_sequences):
+            sequence = []
+            if len(sequences) != 0:
+                base = random.choice(sequences)
+                sequence = base[:random.randrange(len(base))]
+            while len(sequence) < self.sequence_length:
+                sequence.append([random.choice(functions), random.randrange(len(self.conf.input_strategies))])
+            sequences.append(sequence)
+        return json.dumps(sequences)
+
+    def generate_calldata(self, proto_converter, input_values):
+        """
+        Pre-encodes the calls of the external functions, so the runners skip the ABI layer of boa
+        :return: JSON of the calldata per input strategy by function, None if disabled
+        """
+        if not self.raw_calldata:
+            return None
+        calldata = {}
+        for name in proto_converter.external_functions:
+            input_types = proto_converter.function_inputs[name]
+            encoded = []
+            for values in input_values[name]:
+                try:
+                    encoded.append(encode_calldata(name, input_types, values))
+                except Exception as e:
+                    # e.g. a decimal with more than 10 fractional digits, the runners call it through boa
+                    self.logger.debug("Calldata of %s isn't encoded: %s", name, e)
+                    encoded.append(None)
+            calldata[name] = {"calldata": encoded}
+        return json.dumps(calldata)
+
+    def compile(self, source):
+        """
+        Compiles the source according to the compile mode
+        :return: tuple of the compilation result (`None` unless compiled in full) and the error
+        """
+        if self.compile_mode == self.COMPILE_NONE:
+            return None, None
+        if self.compile_mode == self.COMPILE_CHECK:
+            try:
+                self.check_source(source)
+                return None, None
+            except Exception as e:
+                return None, e
+        # Must be overridden
+        return self.compile_source(source)
+
+    def should_publish(self, c_error) -> bool:
+        """
+        The sources failing the compilation are mostly rejected by all runners the same way,
+        so they are published if their failure class is new or at the sampled rate only
+        """
+        if c_error is None:
+            return True
+        # the first line of a compiler error is the message, the source location and the code follow
+        lines = str(c_error).splitlines()
+        failure_class = f"{type(c_error).__name__}: {normalize_message(lines[0] if lines else '')}"
+        if self.publish_new_failures and failure_class not in self.failure_classes:
+            self.failure_classes.add(failure_class)
+            # in the parallel mode the first worker seeing the class publishes it
+            if self.shared_failure_classes is None or \
+                    self.shared_failure_classes.setdefault(failure_class, self.worker_index) == self.worker_index:
+                return True
+        return random.random() < self.failure_publish_rate
+
+    def check_source(self, source):
+        """
+        Runs the cheapest phases of the compiler detecting an invalid source: parsing, semantic analysis and folding
+        """
+        from vyper.compiler.phases import CompilerData
+        data = CompilerData(source)
+        if hasattr(data, "annotated_vyper_module"):
+            # Vyper 0.4.0
+            return data.annotated_vyper_module
+        return data.vyper_module_folded
+
+    def record_compilation(self, data, c_result, c_error):
+        if self.compile_mode == self.COMPILE_NONE:
+            return
+        data["compiled"] = c_error is None
+        if c_error is None:
+            data["compilation_result"] = c_result
+        else:
+            data["error_type"] = type(c_error).__name__
+            data["error_message"] = str(c_error)
+
     # returns (result, error)
     def compile_source(self, proto_result):
         raise Exception("Need Override")
@@ -105,14 +310,17 @@ class GeneratorBase:
     def generate_source(self, msg, converter):
         try:
             proto_converter = converter(msg)
+            proto_converter.range_analysis = self.range_analysis
             proto_converter.visit()
+            for key, count in proto_converter.range_stats.items():
+                self.range_stats[key] += count
         except Exception as e:
             converter_error = {
                 "error_type": type(e).__name__,
                 "error_message": str(e),
                 "json_msg": MessageToJson(msg),
             }
-            self.failure_log.insert_one(converter_error)
+            self.log_failure(converter_error)
 
             self.logger.critical("Converter has crashed: %s", converter_error)
             raise e  # Do we actually want to fail here?
@@ -121,6 +329,41 @@ class GeneratorBase:
     def init_input_generator(self):
         self.input_generator = InputGenerator()
 
+    def init_compile_mode(self):
+        self.compile_mode = self.conf.generator.get("compile_mode", self.COMPILE_FULL)
+        if self.compile_mode not in (self.COMPILE_NONE, self.COMPILE_CHECK, self.COMPILE_FULL):
+            raise ValueError(f"Unknown compile mode: {self.compile_mode}")
+        self.failure_publish_rate = self.conf.generator.get("failure_publish_rate", 0.0)
+        self.publish_new_failures = self.conf.generator.get("publish_new_failures", True)
+        self.failure_classes = set()
+
+    def init_raw_calldata(self):
+        self.raw_calldata = self.conf.generator.get("raw_calldata", True)
+
+    def init_call_sequences(self):
+        self.call_sequences = self.conf.generator.get("call_sequences", 0)
+        self.sequence_length = self.conf.generator.get("sequence_length", 4)
+
+    def init_feedback(self):
+        self.feedback_corpus = self.conf.generator.get("feedback_corpus", None)
+        self.feedback_interval = self.conf.generator.get("feedback_interval", 1000)
+        self.feedback_cursor = None
+        self.fuzzed_inputs = 0
+
+    def init_range_analysis(self):
+        self.range_analysis = self.conf.generator.get("range_analysis", True)
+        self.range_stats = {"provable_reverts": 0, "steered": 0}
+
+    def init_parallel(self):
+        self.workers = self.conf.generator.get("workers", 1)
+        self.stats_interval = self.conf.generator.get("stats_interval", self.DEFAULT_STATS_INTERVAL)
+        self.stats_started = self.stats_reported = time.monotonic()
+        # queue of the persistence process and the index of the worker in the parallel mode
+        self.persistence = None
+        self.worker_index = None
+        # failure classes published by the workers, shared by the parallel mode
+        self.shared_failure_classes = None
+
     def init_logger(self):
         logger_level = getattr(logging, self.conf.verbosity)
         self.logger = logging.getLogger("generator")
@@ -132,6 +375,7 @@ class GeneratorBase:
         self.compilation_log = db_client["compilation_log"]
         self.failure_log = db_client["failure_log"]
         self.run_results = db_client["run_results"]
+        self.coverage_feedback = db_client["coverage_feedback"]
 
     def init_queue(self):
         self.qm = MultiQueueManager(queue_managers=[
@@ -1,18 +1,23 @@
 import atheris
+from bson.objectid import ObjectId
 from google.protobuf.json_format import MessageToJson
 
 from run_api import GeneratorBase
 
 with atheris.instrument_imports():
     import vyper
-    from fuzz.converters.typed_converters import TypedConverter
-    from fuzz.converters.typed_converters_4 import NaginiConverter
+    from fuzz.converters.dialects import DialectConverter
 
 
 class GeneratorDiff(GeneratorBase):
-    def __init__(self, proto_converter, proto_converter_diff, config_file=None):
+    # vyper versions of the sources rendered from the single conversion
+    SOURCE_VERSIONS = {
+        "generation_result_nagini": "0.4.0",
+        "generation_result_adder": "0.3.10",
+    }
+
+    def __init__(self, proto_converter, config_file=None):
         GeneratorBase.__init__(self, proto_converter, config_file)
-        self.converter_diff = proto_converter_diff
 
     def TestOneProtoInput(self, msg):
         data = {
@@ -25,38 +30,34 @@ class GeneratorDiff(GeneratorBase):
             "generator_version": self.__version__,
         }
         proto_converter = self.generate_source(msg, self.converter)
-        proto_converter_diff = self.generate_source(msg, self.converter_diff)
-        # add other compiler results 
-        data["generation_result_nagini"] = proto_converter.result
-        data["generation_result_adder"] = proto_converter_diff.result
+        sources = {field: proto_converter.render(version) for field, version in self.SOURCE_VERSIONS.items()}
+        data.update(sources)
 
-        c_result, c_error = self.compile_source(proto_converter.result)
-        if c_error is None:
-            data["compilation_result"] = c_result
-        else:
-            data["error_type"] = type(c_error).__name__
-            data["error_message"] = str(c_error)
+        c_result, c_error = self.compile(sources["generation_result_nagini"])
+        self.record_compilation(data, c_result, c_error)
 
         self.logger.debug("Compilation result: %s", data)
 
         input_values = self.generate_inputs(proto_converter.function_inputs)
         self.logger.debug("Generated inputs: %s", input_values)
         data["function_input_values"] = input_values
+        data["call_sequences"] = self.generate_sequences(proto_converter.external_functions)
 
-        insert = self.compilation_log.insert_one(data)
+        data["published"] = self.should_publish(c_error)
+        data["_id"] = ObjectId()
+        if not data["published"]:
+            self.persist(data, None)
+            return
 
         message = {
-            "_id": str(insert.inserted_id),
-            "generation_result_nagini": proto_converter.result,
-            "generation_result_adder": proto_converter_diff.result,
+            "_id": str(data["_id"]),
+            **sources,
             "function_input_values": input_values,
+            "call_sequences": data["call_sequences"],
             "json_msg": MessageToJson(msg),
             "generator_version": self.__version__,
         }
-        self.qm.publish(**message)
-
-        # Creating the result entry, so there's no race condition in runners
-        self.run_results.insert_one({'generation_id': str(insert.inserted_id)})
+        self.persist(data, message)
 
     def compile_source(self, proto_result):
         try:
@@ -66,7 +67,7 @@ class GeneratorDiff(GeneratorBase):
             return None, e
 
 
-generator = GeneratorDiff(NaginiConverter, TypedConverter)
+generator = GeneratorDiff(DialectConverter)
 
 if __name__ == '__main__':
     generator.start_generator()
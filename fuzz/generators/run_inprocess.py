@@ -0,0 +1,186 @@
+"""
+In-process differential mode: converts the proto messages, executes them with every configured compiler
+and verifies the results immediately, without the database, the queues and the verifier service.
+
+The compilers are executed by the compiler servers `fuzz/runners/runner_server.py`, one per compiler,
+spawned with the interpreter of the compiler environment (`python` of the compiler configuration)
+or reached through the Unix socket of the compiler configuration (`socket`).
+
+Usage:
+    PYTHONPATH=. python fuzz/generators/run_inprocess.py <proto file or corpus directory> [-o results.jsonl]
+"""
+import argparse
+import json
+import os
+import time
+
+from bson.objectid import ObjectId
+from google.protobuf import text_format
+from google.protobuf.json_format import MessageToJson, Parse
+
+from fuzz.generators.run_api import GeneratorBase
+from fuzz.converters.dialects import DialectConverter
+from fuzz.helpers.compiler_servers import CompilerServerError, CompilerServerPool
+from fuzz.helpers.json_encoders import ExtendedEncoder
+from fuzz.verifiers.verifier_api import VerifierBase
+
+import fuzz.helpers.proto_loader as proto
+
+# Values of the `converter` compiler configuration and the versions of the rendered sources
+DIALECTS = {
+    "typed": "0.3.10",
+    "nagini": "0.4.0",
+}
+
+
+def parse_message(data: bytes):
+    """
+    Parses the `Contract` message stored in JSON (as in `compilation_log`), text or binary format
+    """
+    msg = proto.Contract()
+    if data.lstrip().startswith(b"{"):
+        return Parse(data.decode(), msg)
+    try:
+        return text_format.Parse(data.decode(), msg)
+    except (UnicodeDecodeError, text_format.ParseError):
+        msg.ParseFromString(data)
+        return msg
+
+
+def load_messages(path):
+    """
+    :param path: a message file or a corpus directory
+    :return: iterator over (file path, message) tuples
+    """
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = sorted(os.path.join(path, f) for f in os.listdir(path))
+    for file_path in paths:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        yield file_path, parse_message(data)
+
+
+class LocalVerifier(VerifierBase):
+    def __init__(self, config_file=None, compilers=None):
+        self.compilers = compilers
+        VerifierBase.__init__(self, config_file)
+
+    def target_fields(self) -> list:
+        if self.compilers is None:
+            return VerifierBase.target_fields(self)
+        return [f"result_{c['name']}" for c in self.compilers]
+
+    def init_db(self):
+        pass
+
+
+class InProcessGenerator(GeneratorBase):
+    def __init__(self, config_file=None, compiler_names=None):
+        """
+        :param compiler_names: names of the executed compilers, all configured compilers by default
+        """
+        GeneratorBase.__init__(self, DialectConverter, config_file)
+        self.config_file = config_file
+        self.compilers = [c for c in self.conf.compilers
+                          if compiler_names is None or c["name"] in compiler_names]
+        self.verifier = LocalVerifier(config_file, self.compilers)
+        self.servers = CompilerServerPool(self.compilers, config_file)
+
+    def run(self, path, output):
+        contracts = 0
+        start = time.perf_counter()
+        try:
+            for file_path, msg in load_messages(path):
+                record = self.TestOneProtoInput(msg)
+                record["source"] = file_path
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+
+                contracts += 1
+                if contracts % 100 == 0:
+                    self.log_throughput(contracts, start)
+            self.log_throughput(contracts, start)
+        finally:
+            self.servers.close()
+
+    def log_throughput(self, contracts, start):
+        elapsed = time.perf_counter() - start
+        self.logger.info("%s contracts in %.1f s: %.2f contracts/s",
+                         contracts, elapsed, contracts / elapsed if elapsed > 0 else 0)
+
+    def TestOneProtoInput(self, msg):
+        message = self.prepare_message(msg)
+        if "error_type" in message:
+            return message
+        return self.execute_message(message)
+
+    def prepare_message(self, msg):
+        """
+        Converts the proto message and generates the input values
+        :return: the message for the compilers, or the record of the converter crash
+        """
+        generation_id = str(ObjectId())
+        message = {
+            "_id": generation_id,
+            "json_msg": MessageToJson(msg),
+            "generator_version": self.__version__,
+        }
+
+        # a single conversion, so the sources of all dialects share the random choices
+        versions = {compiler["name"]: DIALECTS[compiler.get("converter", "typed")] for compiler in self.compilers}
+        try:
+            converter = DialectConverter(msg)
+            converter.visit()
+            for name, version in versions.items():
+                message[f"generation_result_{name}"] = converter.render(version)
+        except Exception as e:
+            self.logger.critical("Converter has crashed: %s", e)
+            return {"generation_id": generation_id, "json_msg": message["json_msg"],
+                    "error_type": type(e).__name__, "error_message": str(e)}
+
+        input_values = self.generate_input_values(converter.function_inputs)
+        message["function_input_values"] = json.dumps(input_values, cls=ExtendedEncoder)
+        # the dialects may encode the same function differently, the calls are encoded by boa then
+        if len(set(versions.values())) == 1:
+            message["function_calldata"] = self.generate_calldata(converter, input_values)
+        message["call_sequences"] = self.generate_sequences(converter.external_functions)
+        return message
+
+    def execute_message(self, message):
+        """
+        Executes the message with the compilers and verifies the results
+        :return: the message with the verification results, or the record of the compiler server failure
+        """
+        run_result = {"generation_id": message["_id"]}
+        try:
+            run_result.update(self.servers.run(message))
+        except CompilerServerError as e:
+            self.logger.critical("Compiler server has failed: %s", e)
+            return {"generation_id": message["_id"], "json_msg": message["json_msg"],
+                    "error_type": type(e).__name__, "error_message": str(e)}
+
+        _, results = self.verifier.verify_result(run_result)
+        record = dict(message)
+        record["results"] = results
+        record["has_discrepancy"] = results is not None and self.verifier.has_discrepancy(results)
+        return record
+
+    def init_db(self):
+        pass
+
+    def init_queue(self):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="In-process differential fuzzing of proto messages")
+    parser.add_argument("path", help="proto message file or corpus directory")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file of the results")
+    parser.add_argument("-c", "--config", default=None, help="configuration file")
+    args = parser.parse_args()
+
+    generator = InProcessGenerator(args.config)
+    with open(args.output, "w") as out:
+        generator.run(args.path, out)
@@ -0,0 +1,15 @@
+from eth_abi import encode
+from eth_utils import keccak
+
+
+def abi_signature(name, input_types) -> str:
+    return f"{name}({','.join(t.abi_type for t in input_types)})"
+
+
+def encode_calldata(name, input_types, values) -> str:
+    """
+    Encodes the call of an external function, as the ABI layer of boa does
+    :return: calldata in hex
+    """
+    selector = keccak(text=abi_signature(name, input_types))[:4]
+    return "0x" + (selector + encode([t.abi_type for t in input_types], values)).hex()
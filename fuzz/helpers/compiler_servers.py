@@ -0,0 +1,99 @@
+import os
+import socket
+import subprocess
+import sys
+
+from fuzz.helpers.framing import read_frame, write_frame
+
+
+class CompilerServerError(Exception):
+    pass
+
+
+class CompilerServer:
+    """
+    Client of a `fuzz/runners/runner_server.py` process serving one compiler.
+    Connects to the Unix socket of the compiler configuration if provided,
+    otherwise spawns the server with the `python` interpreter of the compiler environment.
+    """
+
+    def __init__(self, compiler, config_file=None):
+        self.name = compiler["name"]
+        self.process = None
+        self.sock = None
+        if compiler.get("socket") is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(compiler["socket"])
+            self.reader = self.sock.makefile("rb")
+            self.writer = self.sock.makefile("wb")
+            return
+
+        args = [compiler.get("python", sys.executable), "-m", "fuzz.runners.runner_server"]
+        if config_file is not None:
+            args.extend(["--config", config_file])
+        env = dict(os.environ, SERVICE_NAME=self.name)
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self.reader = self.process.stdout
+        self.writer = self.process.stdin
+
+    def submit(self, op, **params):
+        write_frame(self.writer, dict(op=op, **params))
+
+    def receive(self):
+        response = read_frame(self.reader)
+        if response is None:
+            code = self.process.wait() if self.process is not None else None
+            raise CompilerServerError(f"Compiler server {self.name} has exited with code {code}")
+        if "error" in response:
+            raise CompilerServerError(f"Compiler server {self.name}: {response['error']}")
+        return response
+
+    def request(self, op, **params):
+        self.submit(op, **params)
+        return self.receive()
+
+    def close(self):
+        self.writer.close()
+        if self.process is not None:
+            self.process.wait()
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+
+
+class CompilerServerPool:
+    """
+    Drives the servers of all configured compilers
+    """
+
+    def __init__(self, compilers, config_file=None):
+        self.servers = [CompilerServer(c, config_file) for c in compilers]
+
+    def run(self, message) -> dict:
+        """
+        Executes the message with all compilers simultaneously
+        :return: map of the `run_results` field names to the results
+        :raises CompilerServerError: naming all servers failing the message
+        """
+        errors = []
+        submitted = []
+        for server in self.servers:
+            try:
+                server.submit("run", message=message)
+                submitted.append(server)
+            except OSError as e:
+                errors.append(f"Compiler server {server.name}: {e}")
+        # every response is read, so the servers stay in step with the requests after a failure
+        results = {}
+        for server in submitted:
+            try:
+                results[f"result_{server.name}"] = server.receive()["result"]
+            except CompilerServerError as e:
+                errors.append(str(e))
+        if errors:
+            raise CompilerServerError("; ".join(errors))
+        return results
+
+    def close(self):
+        for server in self.servers:
+            server.close()
@@ -55,6 +55,22 @@ class Config:
     def extra_flags(self):
         return self.__config_source["extra_flags"]
 
+    @property
+    def generator(self):
+        return self.__config_source.get("generator", {})
+
+    @property
+    def retention(self):
+        return self.__config_source.get("retention", {})
+
+    @property
+    def runner(self):
+        return self.__config_source.get("runner", {})
+
+    @property
+    def verifier(self):
+        return self.__config_source.get("verifier", {})
+
     def get_compiler_params_by_name(self, name):
         for comp in self.__config_source["compilers"]:
             if comp["name"] == name:
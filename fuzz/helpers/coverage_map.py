@@ -0,0 +1,60 @@
+import zlib
+
+
+class CoverageMap:
+    """
+    Fixed-size bitmap of the covered features, similar to an AFL edge map.
+    A feature is hashed into a bit, so the maps of different processes can be merged.
+    """
+
+    DEFAULT_SIZE = 65536
+
+    def __init__(self, size=DEFAULT_SIZE, bits=None):
+        if size % 8 != 0:
+            raise ValueError(f"Coverage map size must be a multiple of 8: {size}")
+        self.size = size
+        self.bits = bytearray(bits) if bits is not None else bytearray(size // 8)
+
+    def add(self, feature: bytes):
+        self.add_index(zlib.crc32(feature))
+
+    def add_index(self, index: int):
+        index %= self.size
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def update(self, other) -> int:
+        """
+        Merges the other map into this one
+        :return: amount of the bits which are new for this map
+        """
+        current = int.from_bytes(self.bits, "little")
+        merged = int.from_bytes(other.bits, "little")
+        new_bits = (merged & ~current).bit_count()
+        if new_bits:
+            self.bits = bytearray((current | merged).to_bytes(len(self.bits), "little"))
+        return new_bits
+
+    def count(self) -> int:
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def indices(self) -> list:
+        return [i * 8 + bit for i, byte in enumerate(self.bits) if byte for bit in range(8) if byte >> bit & 1]
+
+    def hex(self) -> str:
+        return self.bits.hex()
+
+    @classmethod
+    def fromhex(cls, data: str):
+        bits = bytes.fromhex(data)
+        return cls(len(bits) * 8, bits)
+
+    def compact(self) -> str:
+        """
+        :return: compressed bitmap in hex, the sparse maps of single executions shrink to about a hundred bytes
+        """
+        return zlib.compress(self.bits).hex()
+
+    @classmethod
+    def from_compact(cls, data: str):
+        bits = zlib.decompress(bytes.fromhex(data))
+        return cls(len(bits) * 8, bits)
@@ -0,0 +1,15 @@
+import hashlib
+import json
+
+# The result fields covered by the fingerprint
+# Must include every field the verifier reports discrepancies for
+FINGERPRINT_FIELDS = ("state", "return_value")
+
+
+def result_fingerprint(result: dict) -> str:
+    """
+    Computes a compact digest of the canonicalized function call result
+    :param result: function call result composed by a runner
+    """
+    payload = json.dumps([result[f] for f in FINGERPRINT_FIELDS], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
@@ -0,0 +1,25 @@
+import json
+import struct
+
+# Frames are prefixed with the payload length: 4 bytes, big endian
+HEADER = struct.Struct(">I")
+
+
+def write_frame(stream, obj):
+    payload = json.dumps(obj, separators=(",", ":")).encode()
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_frame(stream):
+    """
+    :return: the decoded frame or None if the stream is closed
+    """
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (size,) = HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    return json.loads(payload)
@@ -53,6 +53,12 @@ class QueueManager:
             )
         )
 
+    def close(self):
+        """
+        Closes the connection, the unacknowledged messages are requeued by the broker
+        """
+        self._connection.close()
+
 
 class MultiQueueManager:
     def __init__(self, queue_managers: List[QueueManager] = None):
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+# Retention modes of the clean documents (verified without discrepancies)
+# kept in full
+RETENTION_NONE = "none"
+# compacted to a summary by `fuzz/tools/retention.py`
+RETENTION_COMPACT = "compact"
+# deleted by the TTL indexes
+RETENTION_EXPIRE = "expire"
+
+# Date field of the TTL indexes
+EXPIRE_FIELD = "expire_at"
+
+DEFAULT_CLEAN_AFTER_HOURS = 24
+
+
+def retention_mode(conf) -> str:
+    mode = conf.retention.get("mode", RETENTION_NONE)
+    if mode not in (RETENTION_NONE, RETENTION_COMPACT, RETENTION_EXPIRE):
+        raise ValueError(f"Unknown retention mode: {mode}")
+    return mode
+
+
+def clean_after(conf) -> timedelta:
+    """
+    :return: time the clean documents are kept in full after their verification
+    """
+    return timedelta(hours=conf.retention.get("clean_after_hours", DEFAULT_CLEAN_AFTER_HOURS))
+
+
+def init_ttl_indexes(*collections):
+    for collection in collections:
+        collection.create_index(EXPIRE_FIELD, expireAfterSeconds=0)
@@ -0,0 +1,41 @@
+import os
+
+import coverage
+import vyper
+
+from fuzz.helpers.coverage_map import CoverageMap
+
+
+class CompilerCoverage:
+    """
+    Collects the arcs of the `vyper` compiler executed by a compilation, using the C tracer of `coverage`.
+    The arcs are keyed by the path relative to the `vyper` package, so the maps of the runners can be merged.
+    """
+
+    def __init__(self, size=CoverageMap.DEFAULT_SIZE):
+        self.size = size
+        self.root = os.path.dirname(vyper.__file__)
+        self.coverage = coverage.Coverage(data_file=None, branch=True, config_file=False,
+                                          include=[os.path.join(self.root, "*")])
+
+    def measure(self, fn, *args, **kwargs):
+        """
+        :return: tuple of the `fn` result and the `CoverageMap` of the compiler arcs executed by `fn`
+        """
+        self.coverage.start()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.coverage.stop()
+            self.coverage.erase()
+            raise
+        self.coverage.stop()
+
+        coverage_map = CoverageMap(self.size)
+        data = self.coverage.get_data()
+        for path in data.measured_files():
+            name = os.path.relpath(path, self.root)
+            for start, end in data.arcs(path) or ():
+                coverage_map.add(f"{name}:{start}:{end}".encode())
+        self.coverage.erase()
+        return result, coverage_map
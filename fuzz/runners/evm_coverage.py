@@ -0,0 +1,20 @@
+from fuzz.helpers.coverage_map import CoverageMap
+
+# Bytes of the code sharing a location of the coverage map
+PC_BUCKET = 8
+
+
+def evm_coverage(computation, size=CoverageMap.DEFAULT_SIZE) -> CoverageMap:
+    """
+    Builds the map of the (opcode, pc bucket) pairs executed by the computation and its children
+    from the program counters traced by the `titanoboa` code stream
+    """
+    coverage_map = CoverageMap(size)
+    computations = [computation]
+    while computations:
+        comp = computations.pop()
+        code = comp.code._raw_code_bytes
+        for pc in set(comp.code._trace):
+            coverage_map.add_index((pc // PC_BUCKET) << 8 | code[pc])
+        computations.extend(comp.children)
+    return coverage_map
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class ExecutionCache:
+    """
+    Bounded LRU of the composed function call results,
+    backed by an optional tier in the database shared by the runners and the campaigns
+    """
+
+    def __init__(self, size, collection=None):
+        self.size = size
+        self.collection = collection
+        self.entries = OrderedDict()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+    def get(self, key):
+        result = self.entries.get(key, None)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return result
+
+        if self.collection is not None:
+            entry = self.collection.find_one({"_id": key}, {"result": 1})
+            if entry is not None:
+                self.store(key, entry["result"])
+                self.stats["shared_hits"] += 1
+                return entry["result"]
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, result):
+        self.store(key, result)
+        if self.collection is not None:
+            self.collection.update_one({"_id": key},
+                                       {"$setOnInsert": {"result": result, "created_at": datetime.now(timezone.utc)}},
+                                       upsert=True)
+
+    def store(self, key, result):
+        self.entries[key] = result
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
@@ -0,0 +1,65 @@
+import multiprocessing
+
+
+class WorkerTimeout(Exception):
+    pass
+
+
+class WorkerCrash(Exception):
+    pass
+
+
+def serve(runner, connection):
+    # the database connections of the parent aren't shared after the fork
+    runner.init_db()
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        result = runner.execute_contract(message)
+        runner.log_execution_stats()
+        connection.send({
+            "result": result,
+            "bytecode_hash": runner.bytecode_hash,
+            "new_coverage": runner.new_coverage,
+            "strategy_coverage": runner.strategy_coverage,
+            # merged into the runner, so the bits aren't new again for the next worker
+            "campaign_coverage": {kind: runner.campaign_coverage[kind].bits for kind in runner.new_coverage},
+            "restart": runner.lifecycle.restart_reason(),
+        })
+        runner.strategy_coverage = {}
+
+
+class ExecutionWorker:
+    """
+    Child process forked from a runner executing its contracts, so a contract stalling or crashing the execution
+    is killed without the runner. The child inherits the runner state: compile and execution caches,
+    coverage maps and settings.
+    """
+
+    def __init__(self, runner):
+        context = multiprocessing.get_context("fork")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=serve, args=(runner, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def execute(self, message, timeout):
+        """
+        :return: the execution report of the message: the results, the bytecode hash and the coverage
+        """
+        self.connection.send(message)
+        # a closed connection is readable as well
+        if not self.connection.poll(timeout):
+            raise WorkerTimeout(f"Execution exceeded {timeout} s")
+        try:
+            return self.connection.recv()
+        except EOFError:
+            self.process.join(1)
+            raise WorkerCrash(f"Worker exited with code {self.process.exitcode}")
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
@@ -0,0 +1,54 @@
+import os
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def resident_memory() -> int:
+    """
+    :return: resident set size of the process in bytes
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+class Lifecycle:
+    """
+    Tracks the resident memory of a runner and the latency of its contracts.
+    The latency is compared with the baseline of the first contracts, the later ones are smoothed exponentially.
+    """
+
+    def __init__(self, max_rss_mb=None, latency_drift=None, baseline_contracts=100, smoothing=0.01):
+        """
+        :param max_rss_mb: resident memory restarting the runner, disabled if None
+        :param latency_drift: ratio of the smoothed latency to the baseline restarting the runner, disabled if None
+        """
+        self.max_rss_mb = max_rss_mb
+        self.latency_drift = latency_drift
+        self.baseline_contracts = baseline_contracts
+        self.smoothing = smoothing
+        self.contracts = 0
+        self.rss = 0
+        self.baseline = None
+        self.latency = 0.0
+
+    def record(self, latency, rss):
+        self.contracts += 1
+        self.rss = rss
+        if self.baseline is None:
+            # running mean over the baseline contracts
+            self.latency += (latency - self.latency) / self.contracts
+            if self.contracts == self.baseline_contracts:
+                self.baseline = self.latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def restart_reason(self):
+        """
+        :return: the reason to restart the runner, None if it's healthy
+        """
+        rss_mb = self.rss / 2 ** 20
+        if self.max_rss_mb and rss_mb > self.max_rss_mb:
+            return f"resident memory {rss_mb:.0f} MB exceeds {self.max_rss_mb} MB"
+        if self.latency_drift and self.baseline and self.latency > self.latency_drift * self.baseline:
+            return f"contract latency {self.latency * 1e3:.1f} ms drifted from {self.baseline * 1e3:.1f} ms"
+        return None
@@ -1,18 +1,69 @@
+import hashlib
 import json
 import os
+import sys
 import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 
 import pika.exceptions
 import boa
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 from fuzz.helpers.config import Config
 from fuzz.helpers.queue_managers import QueueManager
 from fuzz.helpers.db import get_mongo_client
 from fuzz.helpers.json_encoders import ExtendedEncoder, ExtendedDecoder
+from fuzz.helpers.fingerprint import result_fingerprint
+from fuzz.helpers.coverage_map import CoverageMap
+from fuzz.runners.storage_layout import storage_plan, read_storage
+from fuzz.runners.evm_coverage import evm_coverage
+from fuzz.runners.execution_cache import ExecutionCache
+from fuzz.runners.lifecycle import Lifecycle, resident_memory
+from fuzz.runners.execution_worker import ExecutionWorker, WorkerTimeout, WorkerCrash
 
 
 class RunnerBase:
+    # Capture profiles of the execution results
+    # gas and return value only
+    CAPTURE_MINIMAL = "minimal"
+    # the storage used by the contract and the memory digest
+    CAPTURE_STORAGE = "storage"
+    # the storage used by the contract and the memory dump
+    CAPTURE_FULL = "full"
+
+    MEMORY_DUMP_SIZE = 1280
+
+    DEFAULT_COMPILE_CACHE_SIZE = 128
+
+    # Result of a contract skipped for the identical bytecode of a peer runner
+    IDENTICAL_TO = "identical_to"
+    # Seconds the entries of the bytecode index are kept
+    BYTECODE_INDEX_TTL = 24 * 60 * 60
+    DEFAULT_EXECUTION_CACHE_SIZE = 4096
+    # Seconds the entries of the shared execution cache are kept
+    EXECUTION_CACHE_TTL = 7 * 24 * 60 * 60
+    # Results of the call sequences are keyed by the prefix and the sequence index
+    SEQUENCE_PREFIX = "sequence_"
+    # Results of the contracts killed by the supervision
+    TIMEOUT_ERROR = "timeout_error"
+    WORKER_ERROR = "worker_error"
+    DEFAULT_MAX_ATTEMPTS = 2
+    DEAD_LETTER_SUFFIX = ".dead_letter"
+    # Header of a requeued message counting its failed attempts, so the count survives a restart of the runner
+    ATTEMPTS_HEADER = "x-failed-attempts"
+    DEFAULT_ENV_RESET_INTERVAL = 1000
+    # Contracts between the logged execution statistics
+    STATS_INTERVAL = 100
+
+    # Kinds of the coverage fed back to the generator
+    # arcs of the compiler executed by the compilation
+    COVERAGE_COMPILER = "compiler"
+    # (opcode, pc bucket) pairs executed by the function calls
+    COVERAGE_EVM = "evm"
 
     def __init__(self, config_file=None):
         self.conf = Config(config_file) if config_file is not None else Config()
@@ -24,6 +75,7 @@ class RunnerBase:
         self.init_db()
 
     def start_runner(self):
+        self.init_indexes()
         while True:
             try:
                 self.channel.basic_qos(prefetch_count=1)
@@ -39,15 +91,137 @@ class RunnerBase:
 
         self.logger.debug("Compiling contract id: %s", data["_id"])
 
-        result = self.handle_compilation(data)
+        if self.contract_timeout:
+            attempts = (properties.headers or {}).get(self.ATTEMPTS_HEADER, 0)
+            result = self.supervised_compilation(data, attempts)
+            if result is None:
+                self.requeue(body, attempts + 1)
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                return
+        else:
+            result = self.execute_contract(data)
+            self.log_execution_stats()
         self.logger.debug("Compilation and execution result: %s", result)
 
+        if self.new_coverage:
+            self.coverage_feedback_collection.insert_one({
+                "generation_id": data["_id"],
+                "compiler": self.compiler_key,
+                "json_msg": data["json_msg"],
+                "new_coverage": self.new_coverage,
+            })
+        if self.strategy_coverage:
+            self.coverage_stats_collection.bulk_write([
+                UpdateOne({"compiler": self.compiler_key, "input_strategy": strategy},
+                          {"$inc": stats}, upsert=True)
+                for strategy, stats in self.strategy_coverage.items()], ordered=False)
+            self.strategy_coverage = {}
+
         self.queue_collection.update_one({"_id": ObjectId(data["_id"])},
                                          {"$set": {f"compiled_{self.compiler_key}": True}})
+        # releasing a verifier lease, so the entry is re-checked as soon as possible
         self.run_results_collection.update_one({"generation_id": data["_id"]},
-                                               {"$set": {f"result_{self.compiler_key}": result, "is_handled": False}})
+                                               {"$set": {f"result_{self.compiler_key}": result,
+                                                         f"bytecode_hash_{self.compiler_key}": self.bytecode_hash,
+                                                         "is_handled": False, "claimed_by": None}})
         ch.basic_ack(delivery_tag=method.delivery_tag)
 
+        # the worker is recycled by the supervision
+        reason = self.lifecycle.restart_reason() if not self.contract_timeout else None
+        if reason is not None:
+            self.logger.warning("Restarting the runner: %s", reason)
+            self.restart()
+
+    def execute_contract(self, data):
+        """
+        Executes the contract in a clean environment: the state is reverted after the contract,
+        and the environment of boa is replaced every `env_reset_interval` contracts, dropping its registries
+        """
+        start = time.perf_counter()
+        with boa.env.anchor():
+            result = self.handle_compilation(data)
+        self.lifecycle.record(time.perf_counter() - start, resident_memory())
+
+        self.env_contracts += 1
+        if self.env_reset_interval and self.env_contracts >= self.env_reset_interval:
+            boa.set_env(boa.Env())
+            self.env_contracts = 0
+        return result
+
+    def restart(self):
+        """
+        Replaces the runner process once the current message is acknowledged,
+        the prefetched messages are requeued when the connection is closed
+        """
+        self.qm.close()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    def supervised_compilation(self, data, attempts=0):
+        """
+        Executes the contract in the worker process. The worker is killed and replaced if the contract runs
+        longer than `contract_timeout` seconds or crashes it. A failing contract is retried up to `max_attempts`
+        times, then the failure is recorded as its result and the message is sent to the dead-letter queue.
+        :param attempts: amount of the failed attempts before
+        :return: the results, or None if the contract is retried
+        """
+        if self.worker is None:
+            self.worker = ExecutionWorker(self)
+        try:
+            report = self.worker.execute(data, self.contract_timeout)
+        except (WorkerTimeout, WorkerCrash) as e:
+            self.logger.warning("Contract %s: %s, recycling the worker", data["_id"], e)
+            self.worker.kill()
+            self.worker = None
+
+            if attempts + 1 < self.max_attempts:
+                return None
+            self.publish_dead_letter(data)
+            self.bytecode_hash = None
+            self.new_coverage = {}
+            error = self.TIMEOUT_ERROR if isinstance(e, WorkerTimeout) else self.WORKER_ERROR
+            input_values = json.loads(data["function_input_values"], cls=ExtendedDecoder)
+            return [{error: str(e)} for _ in input_values.get("__init__", [[]])]
+
+        # the worker may be recycled later, its campaign coverage is kept by the runner
+        for kind, bits in report["campaign_coverage"].items():
+            self.campaign_coverage[kind].update(CoverageMap(len(bits) * 8, bits))
+        if report["restart"] is not None:
+            self.logger.warning("Recycling the worker: %s", report["restart"])
+            self.worker.kill()
+            self.worker = None
+        self.bytecode_hash = report["bytecode_hash"]
+        self.new_coverage = report["new_coverage"]
+        for strategy, stats in report["strategy_coverage"].items():
+            total = self.strategy_coverage.setdefault(strategy, {"calls": 0, "new_bits": 0})
+            total["calls"] += stats["calls"]
+            total["new_bits"] += stats["new_bits"]
+        return report["result"]
+
+    def requeue(self, body, attempts):
+        """
+        Publishes the message again with the amount of its failed attempts, the original message is acknowledged
+        """
+        self.channel.basic_publish(
+            exchange='',
+            routing_key=self.queue_name,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=pika.DeliveryMode.Persistent,
+                                            headers={self.ATTEMPTS_HEADER: attempts})
+        )
+
+    def publish_dead_letter(self, data):
+        """
+        The contracts failing repeatedly are kept in the dead-letter queue for the triage
+        """
+        dead_letter_queue = f"{self.queue_name}{self.DEAD_LETTER_SUFFIX}"
+        self.channel.queue_declare(dead_letter_queue, durable=True)
+        self.channel.basic_publish(
+            exchange='',
+            routing_key=dead_letter_queue,
+            body=json.dumps(data),
+            properties=pika.BasicProperties(delivery_mode=pika.DeliveryMode.Persistent)
+        )
+
     def generation_result(self):
         return "generation_result"
 
@@ -55,49 +229,258 @@ class RunnerBase:
         input_values = json.loads(
             _contract_desc["function_input_values"], cls=ExtendedDecoder)
         init_values = input_values.get("__init__", [[]])
+        # amount of the new coverage bits by kind
+        self.new_coverage = {}
+
+        self.bytecode_hash = None
+        try:
+            deployer = self.compile(_contract_desc[self.generation_result()])
+        except Exception as e:
+            self.logger.debug("Compilation failed: %s", str(e))
+            return [dict(deploy_error=str(e)) for _ in init_values]
 
+        self.bytecode_hash = hashlib.blake2b(deployer.compiler_data.bytecode, digest_size=16).hexdigest()
+        owner = self.claim_bytecode(_contract_desc["_id"])
+        if owner is not None:
+            self.logger.debug("Bytecode is identical to %s, executions skipped", owner)
+            self.execution_stats["skipped"] += 1
+            return {self.IDENTICAL_TO: owner}
+
+        # the generator pre-encodes the calls of the external functions, the ABI layer of boa is skipped then
+        calldata = _contract_desc.get("function_calldata", None)
+        calldata = json.loads(calldata) if calldata is not None else None
+        if calldata is not None:
+            externals = sorted(calldata)
+        else:
+            # listed once per compilation from the type metadata, not from the attributes of each deployment
+            externals = sorted(name for name, func_t in deployer.compiler_data.function_signatures.items()
+                               if func_t.is_external and name.startswith("func"))
+        sequences = _contract_desc.get("call_sequences", None)
+        sequences = json.loads(sequences) if sequences is not None else None
+
+        start = time.process_time()
         results = []
         for iv in init_values:
             self.logger.debug("Constructor values: %s", iv)
             try:
-                contract = boa.loads(_contract_desc[self.generation_result()],
-                                     *iv, compiler_args=self.comp_settings)
+                contract = deployer.deploy(*iv)
             except Exception as e:
                 self.logger.debug("Deployment failed: %s", str(e))
                 results.append(dict(deploy_error=str(e)))
                 continue
 
+            if self.capture_profile != self.CAPTURE_MINIMAL:
+                self.storage_plan = storage_plan(contract.compiler_data)
+
             _r = dict()
-            externals = [c for c in dir(contract) if c.startswith('func')]
-            internals = [c for c in dir(
-                contract.internal) if c.startswith('func')]
+            sequence_results = {}
+            if sequences is not None:
+                # the sequences start from the deployed state
+                with boa.env.anchor():
+                    sequence_results = self.execute_sequences(contract, sequences, input_values, calldata)
+
+            call_state = self.init_call_state(contract, iv)
             for fn in externals:
-                function_call_res = []
-                _r[fn] = [self.execution_result(contract, fn, input_values[fn][i])
-                          for i in range(self.inputs_per_function)]
-            """
-            for fn in internals:
-                function_call_res = []
-                _r[fn] = [self.execution_result(
-                    contract, fn, input_values[fn][i], internal=True)
-                    for i in range(self.inputs_per_function)]
-            
-            fn = "__default__"
-            if fn in dir(contract):
-                function_call_res = [self.execution_result(contract, fn, [])
-                                     for i in range(self.inputs_per_function)]
-                _r[fn] = function_call_res
-            """
+                _r[fn] = []
+                for i, strategy in enumerate(self.conf.input_strategies):
+                    # the new coverage is attributed to the input strategy
+                    self.input_strategy = strategy
+                    fn_calldata = calldata[fn]["calldata"][i] if calldata is not None else None
+                    result = self.memoized_execution_result(call_state, contract, fn, input_values[fn][i],
+                                                            fn_calldata)
+                    _r[fn].append(result)
+                    self.execution_stats["calls"] += 1
+                    if "runtime_error" in result:
+                        self.execution_stats["runtime_errors"] += 1
+            _r.update(sequence_results)
             results.append(_r)
+        self.execution_stats["executed"] += 1
+        self.execution_stats["execution_time"] += time.process_time() - start
         return results
 
+    def execute_sequences(self, _contract, sequences, input_values, calldata=None) -> dict:
+        """
+        Executes the call sequences as a trie of their shared prefixes. The state is snapshotted at each node,
+        so a prefix shared by several sequences is executed once.
+        :param sequences: lists of [function name, input strategy index]
+        :return: the call results of each sequence keyed by `SEQUENCE_PREFIX` and the sequence index,
+            the verifier compares them as the results of a function
+        """
+        trie = {"children": {}, "ends": []}
+        for index, sequence in enumerate(sequences):
+            node = trie
+            for fn, i in sequence:
+                node = node["children"].setdefault((fn, i), {"children": {}, "ends": []})
+            node["ends"].append(index)
+
+        results = {}
+        self.execute_sequence_node(_contract, trie, [], results, input_values, calldata)
+        return {f"{self.SEQUENCE_PREFIX}{index}": results[index] for index in sorted(results)}
+
+    def execute_sequence_node(self, _contract, node, path, results, input_values, calldata):
+        for (fn, i), child in node["children"].items():
+            with boa.env.anchor():
+                self.input_strategy = self.conf.input_strategies[i]
+                fn_calldata = calldata[fn]["calldata"][i] if calldata is not None else None
+                path.append(self.call_result(_contract, fn, input_values[fn][i], fn_calldata))
+                for index in child["ends"]:
+                    results[index] = list(path)
+                self.execute_sequence_node(_contract, child, path, results, input_values, calldata)
+                path.pop()
+
+    def init_call_state(self, _contract, init_values) -> dict:
+        """
+        :return: the pre-state of the calls to a deployment: the deployment key, the key of the last state changing
+            call, which covers the whole call history, and the cached state changing calls not executed yet
+        """
+        # the cached results depend on the captured data as well
+        profile = [self.capture_profile, self.COVERAGE_EVM in self.campaign_coverage]
+        # the results may contain the addresses of the contract, of the sender or of the contracts it creates
+        addresses = [str(_contract.address), str(boa.env.eoa)]
+        deployment = json.dumps([self.bytecode_hash, init_values, profile, addresses], cls=ExtendedEncoder)
+        return {"deployment": deployment, "history": None, "pending": []}
+
+    def memoized_execution_result(self, call_state, _contract, fn, _input_values, calldata=None):
+        """
+        Takes the result of the call from the execution cache if the same bytecode was called with the same
+        calldata and pre-state. The cached state changing calls are executed before the next cache miss,
+        so the state of the contract is up to date when it's needed.
+        :param calldata: calldata pre-encoded by the generator, the call goes through boa if None
+        """
+        if self.execution_cache is None:
+            return self.call_result(_contract, fn, _input_values, calldata)
+
+        mutability = getattr(_contract, fn).func_t.mutability.name
+        mutating = mutability not in ("PURE", "VIEW")
+        # pure functions don't depend on the state
+        history = None if mutability == "PURE" else call_state["history"]
+        # the raw calls return the undecoded data, so they don't share the results with the calls through boa
+        call = [fn, _input_values] if calldata is None else calldata
+        key = hashlib.blake2b(json.dumps([call_state["deployment"], history, call],
+                                         cls=ExtendedEncoder).encode(), digest_size=16).hexdigest()
+
+        result = self.execution_cache.get(key)
+        if result is None:
+            for pending_fn, pending_values, pending_calldata in call_state["pending"]:
+                try:
+                    if pending_calldata is None:
+                        getattr(_contract, pending_fn)(*pending_values, gas=self.call_gas_limit)
+                    else:
+                        boa.env.execute_code(to_address=_contract.address, data=bytes.fromhex(pending_calldata[2:]),
+                                             gas=self.call_gas_limit)
+                except Exception as e:
+                    self.logger.debug("%s caught error: %s", pending_fn, str(e))
+            call_state["pending"] = []
+            result = self.call_result(_contract, fn, _input_values, calldata)
+            self.execution_cache.put(key, result)
+        elif mutating:
+            call_state["pending"].append((fn, _input_values, calldata))
+
+        if mutating:
+            call_state["history"] = key
+        return result
+
+    def claim_bytecode(self, generation_id):
+        """
+        Claims the execution of the contract bytecode, the first runner compiling it wins
+        :return: name of the runner owning the identical bytecode, or None if the contract must be executed
+        """
+        if self.bytecode_index is None:
+            return None
+        key = f"{generation_id}:{self.bytecode_hash}"
+        try:
+            self.bytecode_index.insert_one({"_id": key, "compiler": self.compiler_key,
+                                            "created_at": datetime.now(timezone.utc)})
+            return None
+        except DuplicateKeyError:
+            owner = self.bytecode_index.find_one({"_id": key})["compiler"]
+            # a redelivered message was claimed by this runner before
+            return owner if owner != self.compiler_key else None
+
+    def log_execution_stats(self):
+        stats = self.execution_stats
+        contracts = stats["executed"] + stats["skipped"]
+        if contracts == 0 or contracts % self.STATS_INTERVAL != 0:
+            return
+        # the skipped contracts are estimated to cost the average execution time
+        average = stats["execution_time"] / stats["executed"] if stats["executed"] else 0
+        saved = stats["skipped"] * average
+        total = stats["execution_time"] + saved
+        self.logger.info("%s of %s contracts skipped with identical bytecode, %.1f%% of the execution time saved",
+                         stats["skipped"], contracts, 100 * saved / total if total else 0)
+        # the share of the calls reverting regardless of the inputs is cut by the range analysis of the generator
+        self.logger.info("%.1f%% of %s calls ended in runtime_error",
+                         100 * stats["runtime_errors"] / stats["calls"] if stats["calls"] else 0, stats["calls"])
+        self.logger.info("Resident memory %.0f MB, contract latency %.1f ms",
+                         self.lifecycle.rss / 2 ** 20, self.lifecycle.latency * 1e3)
+        if self.execution_cache is not None:
+            cache_stats = self.execution_cache.stats
+            calls = sum(cache_stats.values())
+            self.logger.info("Execution cache: %s hits, %s shared hits, %s misses, %.1f%% hit rate",
+                             cache_stats["hits"], cache_stats["shared_hits"], cache_stats["misses"],
+                             100 * (calls - cache_stats["misses"]) / calls if calls else 0)
+
+    def compile(self, source):
+        """
+        Compiles the source or takes the deployer from the cache
+        """
+        deployer = self.compile_cache.get(source, None)
+        if deployer is not None:
+            self.compile_cache.move_to_end(source)
+            return deployer
+
+        if self.compiler_coverage is None:
+            deployer = boa.loads_partial(source, compiler_args=self.comp_settings)
+        else:
+            deployer, coverage_map = self.compiler_coverage.measure(
+                boa.loads_partial, source, compiler_args=self.comp_settings)
+            self.add_coverage(self.COVERAGE_COMPILER, coverage_map)
+        self.compile_cache[source] = deployer
+        if len(self.compile_cache) > self.compile_cache_size:
+            self.compile_cache.popitem(last=False)
+        return deployer
+
+    def add_coverage(self, kind, coverage_map):
+        """
+        Merges the coverage into the campaign coverage of the runner, counting the new bits
+        """
+        new_bits = self.campaign_coverage[kind].update(coverage_map)
+        if new_bits:
+            self.new_coverage[kind] = self.new_coverage.get(kind, 0) + new_bits
+        return new_bits
+
+    def call_result(self, _contract, fn, _input_values, calldata=None):
+        if calldata is None:
+            return self.execution_result(_contract, fn, _input_values)
+        return self.raw_execution_result(_contract, fn, calldata)
+
+    def raw_execution_result(self, _contract, fn, calldata):
+        """
+        Executes the pre-encoded calldata as a message call to the contract.
+        The return data isn't decoded, the verifier compares the bytes.
+        """
+        try:
+            self.logger.debug("calling %s with raw calldata: %s", fn, calldata)
+            computation = boa.env.execute_code(to_address=_contract.address, data=bytes.fromhex(calldata[2:]),
+                                               gas=self.call_gas_limit)
+            if computation.is_error:
+                res = repr(computation.error)
+                self.logger.debug("%s caught error: %s", fn, res)
+                return dict(runtime_error=res)
+            _function_call_res = self.compose_result(_contract, computation, "0x" + computation.output.hex())
+        except Exception as e:
+            res = str(e)
+            self.logger.debug("%s caught error: %s", fn, res)
+            _function_call_res = dict(runtime_error=res)
+        return _function_call_res
+
     def execution_result(self, _contract, fn, _input_values, internal=False):
         try:
             self.logger.debug("calling %s with calldata: %s", fn, _input_values)
             if internal:
                 computation, res = getattr(_contract.internal, fn)(*_input_values)
             else:
-                computation, res = getattr(_contract, fn)(*_input_values)
+                computation, res = getattr(_contract, fn)(*_input_values, gas=self.call_gas_limit)
             self.logger.debug("%s result: %s", fn, res)
             _function_call_res = self.compose_result(_contract, computation, res)
         except Exception as e:
@@ -108,18 +491,34 @@ class RunnerBase:
 
     # add/remove the data
     def compose_result(self, _contract, comp, ret) -> dict:
-        # now we dump first ten slots only
-        state = [str(comp.state.get_storage(bytes.fromhex(
-            _contract.address[2:]), i)) for i in range(10)]
+        state = {}
+        if self.capture_profile != self.CAPTURE_MINIMAL:
+            address = bytes.fromhex(_contract.address[2:])
+            state = read_storage(self.storage_plan, lambda slot: comp.state.get_storage(address, slot))
 
-        # first 1280 bytes are dumped
-        memory = comp.memory_read_bytes(0, 1280).hex()
+        memory = None
+        if self.capture_profile == self.CAPTURE_FULL:
+            # first 1280 bytes are dumped
+            memory = comp.memory_read_bytes(0, self.MEMORY_DUMP_SIZE).hex()
+        elif self.capture_profile == self.CAPTURE_STORAGE:
+            memory = hashlib.blake2b(comp.memory_read_bytes(0, self.MEMORY_DUMP_SIZE),
+                                     digest_size=16).hexdigest()
 
         consumed_gas = comp.get_gas_used()
         # The order of function calls is the same for all runners
         # Adding the name just to know what result is checked
-        return dict(state=state, memory=memory, consumed_gas=consumed_gas,
-                    return_value=json.dumps(ret, cls=ExtendedEncoder))
+        result = dict(state=state, memory=memory, consumed_gas=consumed_gas,
+                      return_value=json.dumps(ret, cls=ExtendedEncoder))
+        # allows the verifier to compare the results at once
+        result["fingerprint"] = result_fingerprint(result)
+
+        if self.COVERAGE_EVM in self.campaign_coverage:
+            coverage_map = evm_coverage(comp, self.coverage_size)
+            result["coverage"] = coverage_map.compact()
+            stats = self.strategy_coverage.setdefault(self.input_strategy, {"calls": 0, "new_bits": 0})
+            stats["calls"] += 1
+            stats["new_bits"] += self.add_coverage(self.COVERAGE_EVM, coverage_map)
+        return result
 
     def init_config(self):
         self.compiler_name = os.environ.get("SERVICE_NAME")
@@ -127,6 +526,51 @@ class RunnerBase:
             self.compiler_name)
         self.compiler_key = f"{self.compiler_name}"
 
+        runner_settings = self.conf.runner
+        self.capture_profile = runner_settings.get("capture", self.CAPTURE_STORAGE)
+        if self.capture_profile not in (self.CAPTURE_MINIMAL, self.CAPTURE_STORAGE, self.CAPTURE_FULL):
+            raise ValueError(f"Unknown capture profile: {self.capture_profile}")
+        self.storage_plan = []
+
+        self.compile_cache = OrderedDict()
+        self.compile_cache_size = runner_settings.get("compile_cache_size", self.DEFAULT_COMPILE_CACHE_SIZE)
+
+        self.skip_identical_bytecode = runner_settings.get("skip_identical_bytecode", True)
+        self.bytecode_index = None
+        self.bytecode_hash = None
+        self.execution_stats = {"executed": 0, "skipped": 0, "execution_time": 0.0, "calls": 0, "runtime_errors": 0}
+
+        execution_cache_size = runner_settings.get("execution_cache_size", self.DEFAULT_EXECUTION_CACHE_SIZE)
+        self.shared_execution_cache = runner_settings.get("shared_execution_cache", False)
+        self.execution_cache = ExecutionCache(execution_cache_size) if execution_cache_size > 0 else None
+
+        coverage_kinds = runner_settings.get("coverage", [])
+        for kind in coverage_kinds:
+            if kind not in (self.COVERAGE_COMPILER, self.COVERAGE_EVM):
+                raise ValueError(f"Unknown coverage kind: {kind}")
+        self.coverage_size = runner_settings.get("coverage_size", CoverageMap.DEFAULT_SIZE)
+        self.campaign_coverage = {kind: CoverageMap(self.coverage_size) for kind in coverage_kinds}
+        self.new_coverage = {}
+        # calls and new evm coverage bits by input strategy
+        self.strategy_coverage = {}
+        self.input_strategy = None
+        self.compiler_coverage = None
+        if self.COVERAGE_COMPILER in coverage_kinds:
+            from fuzz.runners.compiler_coverage import CompilerCoverage
+            self.compiler_coverage = CompilerCoverage(self.coverage_size)
+
+        # gas budget of a call, the default gas limit of boa if None
+        self.call_gas_limit = runner_settings.get("call_gas_limit", None)
+        # wall-clock seconds of a contract in the worker process, the contracts are executed in-process if 0
+        self.contract_timeout = runner_settings.get("contract_timeout", 0)
+        self.max_attempts = runner_settings.get("max_attempts", self.DEFAULT_MAX_ATTEMPTS)
+        self.worker = None
+
+        # contracts executed in the environment of boa, replaced every `env_reset_interval` contracts
+        self.env_reset_interval = runner_settings.get("env_reset_interval", self.DEFAULT_ENV_RESET_INTERVAL)
+        self.env_contracts = 0
+        self.lifecycle = Lifecycle(runner_settings.get("max_rss_mb", None), runner_settings.get("latency_drift", None))
+
     def init_logger(self):
         logger_level = getattr(logging, self.conf.verbosity)
         self.logger = logging.getLogger(f"runner_{self.compiler_key}")
@@ -155,3 +599,15 @@ class RunnerBase:
         db_ = get_mongo_client(self.conf.db["host"], self.conf.db["port"])
         self.queue_collection = db_["compilation_log"]
         self.run_results_collection = db_["run_results"]
+        self.coverage_feedback_collection = db_["coverage_feedback"]
+        self.coverage_stats_collection = db_["coverage_stats"]
+        if self.skip_identical_bytecode:
+            self.bytecode_index = db_["bytecode_index"]
+        if self.execution_cache is not None and self.shared_execution_cache:
+            self.execution_cache.collection = db_["execution_cache"]
+
+    def init_indexes(self):
+        if self.bytecode_index is not None:
+            self.bytecode_index.create_index("created_at", expireAfterSeconds=self.BYTECODE_INDEX_TTL)
+        if self.execution_cache is not None and self.execution_cache.collection is not None:
+            self.execution_cache.collection.create_index("created_at", expireAfterSeconds=self.EXECUTION_CACHE_TTL)
@@ -0,0 +1,90 @@
+import argparse
+import os
+import socket
+import sys
+
+from fuzz.helpers.framing import read_frame, write_frame
+from fuzz.runners.runner_api import RunnerBase
+
+
+class RunnerServer(RunnerBase):
+    """
+    Long-lived runner without a queue and a database, serving the requests of an orchestrator.
+    Requests and responses are length-prefixed JSON frames, see `fuzz/helpers/framing.py`.
+    Must be run in the environment of the tested compiler with `SERVICE_NAME` set.
+
+    Requests:
+    - `{"op": "run", "message": <generator message>}` -> `{"result": <run results>}`
+    - `{"op": "ping"}` -> `{}`
+    """
+
+    def serve(self, reader, writer):
+        while True:
+            request = read_frame(reader)
+            if request is None:
+                break
+            try:
+                response = self.handle_request(request)
+            except Exception as e:
+                self.logger.error("Request failed: %s", e)
+                response = {"error": f"{type(e).__name__}: {e}"}
+            write_frame(writer, response)
+
+    def serve_stdio(self):
+        # stdout is reserved for the frames, anything printed goes to stderr
+        writer = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        self.serve(sys.stdin.buffer, writer)
+
+    def serve_socket(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        self.logger.info("Listening on %s", path)
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rb") as reader, conn.makefile("wb") as writer:
+                self.serve(reader, writer)
+
+    def handle_request(self, request):
+        op = request["op"]
+        if op == "run":
+            message = request["message"]
+            self.logger.debug("Compiling contract id: %s", message["_id"])
+            return {"result": self.execute_contract(message)}
+        if op == "ping":
+            return {}
+        raise ValueError(f"Unknown operation: {op}")
+
+    def generation_result(self):
+        return f"generation_result_{self.compiler_key}"
+
+    def init_queue(self):
+        pass
+
+    def init_db(self):
+        pass
+
+    def init_compiler_settings(self):
+        if "optimization" not in self.compiler_params["exec_params"]:
+            RunnerBase.init_compiler_settings(self)
+            return
+        from vyper.compiler.settings import Settings, OptimizationLevel
+        compiler_settings = Settings(optimize=OptimizationLevel.from_string(
+            self.compiler_params["exec_params"]["optimization"]))
+        self.comp_settings = {"settings": compiler_settings}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compiler server of the in-process modes")
+    parser.add_argument("--config", default=None, help="configuration file")
+    parser.add_argument("--socket", default=None, help="serve on the Unix socket instead of stdin/stdout")
+    args = parser.parse_args()
+
+    runner = RunnerServer(args.config)
+    if args.socket is not None:
+        runner.serve_socket(args.socket)
+    else:
+        runner.serve_stdio()
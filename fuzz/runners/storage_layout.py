@@ -0,0 +1,124 @@
+import math
+
+WORD_SIZE = 32
+
+# Nodes of the storage plan
+# (STATIC, amount of slots)
+STATIC = "static"
+# (FIXED_LIST, count, base node, base slots)
+FIXED_LIST = "fixed_list"
+# (DYN_ARRAY, max count, base node, base slots)
+DYN_ARRAY = "dyn_array"
+# (BYTES, max length)
+BYTES = "bytes"
+# (HASH_MAP,) values are located by hashing, hence can't be listed
+HASH_MAP = "hash_map"
+
+
+def parse_type(vyper_type: str, n_slots=None) -> tuple:
+    """
+    Parses the type printed in the compiler storage layout into a storage plan node
+    :param n_slots: the amount of slots if provided by the layout, used for unknown types
+    """
+    vyper_type = vyper_type.strip()
+    if vyper_type.startswith("DynArray["):
+        base_type, count = vyper_type[len("DynArray["):-1].rsplit(",", 1)
+        base = parse_type(base_type)
+        return DYN_ARRAY, int(count), base, node_words(base)
+    if vyper_type.startswith(("Bytes[", "String[")):
+        return BYTES, int(vyper_type[vyper_type.index("[") + 1:-1])
+    if vyper_type.startswith("HashMap["):
+        return (HASH_MAP,)
+    if vyper_type.endswith("]"):
+        base_type, count = vyper_type[:-1].rsplit("[", 1)
+        base = parse_type(base_type)
+        return FIXED_LIST, int(count), base, node_words(base)
+    return STATIC, n_slots if n_slots is not None else 1
+
+
+def node_words(node: tuple) -> int:
+    """
+    :return: the amount of storage slots allocated for the node
+    """
+    kind = node[0]
+    if kind == STATIC:
+        return node[1]
+    if kind == FIXED_LIST:
+        return node[1] * node[3]
+    if kind == DYN_ARRAY:
+        # the length is stored in the first slot
+        return 1 + node[1] * node[3]
+    if kind == BYTES:
+        return 1 + math.ceil(node[1] / WORD_SIZE)
+    return 1
+
+
+def storage_words(vyper_type: str) -> int:
+    """
+    Computes the amount of storage slots occupied by a variable of the type
+    :param vyper_type: the type as it's printed in the compiler storage layout
+    """
+    return node_words(parse_type(vyper_type))
+
+
+def layout_variables(layout: dict):
+    """
+    Iterates over the variables of the compiler storage layout
+    :return: (name, type, slot, amount of slots or None) tuples
+    """
+    for name, item in layout.items():
+        if not isinstance(item, dict):
+            continue
+        if "slot" not in item:
+            # nested layouts of the imported modules
+            yield from layout_variables(item)
+            continue
+        yield name, item["type"], item["slot"], item.get("n_slots", None)
+
+
+def storage_plan(compiler_data) -> list:
+    """
+    Builds the storage plan of the contract from its storage layout
+    :return: list of (slot, node) tuples
+    """
+    layout = compiler_data.storage_layout.get("storage_layout", {})
+    return [(slot, parse_type(vyper_type, n_slots))
+            for _, vyper_type, slot, n_slots in layout_variables(layout)]
+
+
+def read_storage(plan: list, read) -> dict:
+    """
+    Reads the slots of the storage plan. Only the used part of the dynamic arrays and byte strings is read.
+    :param read: callable returning the value of a slot
+    :return: map of the non-zero slots to their values
+    """
+    state = {}
+
+    def _read(slot):
+        value = read(slot)
+        if value != 0:
+            state[str(slot)] = hex(value)
+        return value
+
+    def _visit(slot, node):
+        kind = node[0]
+        if kind == STATIC:
+            for i in range(node[1]):
+                _read(slot + i)
+        elif kind == FIXED_LIST:
+            _, count, base, base_words = node
+            for i in range(count):
+                _visit(slot + i * base_words, base)
+        elif kind == DYN_ARRAY:
+            _, max_count, base, base_words = node
+            length = min(_read(slot), max_count)
+            for i in range(length):
+                _visit(slot + 1 + i * base_words, base)
+        elif kind == BYTES:
+            length = min(_read(slot), node[1])
+            for i in range(math.ceil(length / WORD_SIZE)):
+                _read(slot + 1 + i)
+
+    for slot, node in plan:
+        _visit(slot, node)
+    return state
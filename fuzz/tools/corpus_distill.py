@@ -0,0 +1,138 @@
+"""
+Distills the corpus of the generator: keeps a minimal set of the entries preserving the coverage
+of the compiler, dropping the duplicates and the entries without new coverage.
+
+The entries are converted with `TypedConverter` and compiled in a process pool. The features of an entry are:
+- the arcs of the compiler executed by the compilation of its source
+- the error type if the source doesn't compile, so one entry of each error is kept
+The conversions are seeded, so an entry is always converted to the same source. The entries converted to the same source are deduplicated by the source hash before the features are compared.
+
+Usage: PYTHONPATH=. python fuzz/tools/corpus_distill.py /corpus /corpus_distilled [-j 8]
+"""
+import argparse
+import hashlib
+import heapq
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import vyper
+
+from fuzz.converters.typed_converters import TypedConverter
+from fuzz.generators.run_inprocess import parse_message
+from fuzz.helpers.coverage_map import CoverageMap
+
+# Seed of the conversions, so the source and the features of an entry don't change between the runs
+SEED = 0
+
+_compiler_coverage = None
+
+
+def _init_worker(coverage_size):
+    global _compiler_coverage
+    if coverage_size:
+        from fuzz.runners.compiler_coverage import CompilerCoverage
+        _compiler_coverage = CompilerCoverage(coverage_size)
+
+
+def extract_features(path):
+    """
+    :return: tuple of the path, the file size, the source hash and the features,
+        or None if the entry can't be converted
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        random.seed(SEED)
+        converter = TypedConverter(parse_message(data))
+        converter.visit()
+    except Exception:
+        return None
+
+    source = converter.result
+    source_hash = hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+    if _compiler_coverage is None:
+        return path, len(data), source_hash, []
+    try:
+        _, coverage_map = _compiler_coverage.measure(vyper.compile_code, source)
+    except Exception as e:
+        return path, len(data), source_hash, [f"error:{type(e).__name__}"]
+    return path, len(data), source_hash, coverage_map.indices()
+
+
+def deduplicate(entries):
+    """
+    Keeps the smallest entry of each source
+    """
+    by_source = {}
+    for entry in entries:
+        _, size, source_hash, _ = entry
+        if source_hash not in by_source or size < by_source[source_hash][1]:
+            by_source[source_hash] = entry
+    return list(by_source.values())
+
+
+def distill(entries):
+    """
+    Greedy set cover: repeatedly takes the entry adding the most uncovered features, the smaller one on a tie.
+    The entries without features are kept, as they are distinguished by the source only.
+    :return: the kept entries
+    """
+    kept = [e for e in entries if not e[3]]
+    covered = set()
+    # gains are only decreasing, so the stale gains of the heap are recomputed lazily
+    heap = [(-len(e[3]), e[1], i) for i, e in enumerate(entries) if e[3]]
+    heapq.heapify(heap)
+    while heap:
+        gain, size, i = heapq.heappop(heap)
+        features = entries[i][3]
+        new_gain = sum(1 for f in features if f not in covered)
+        if new_gain == 0:
+            continue
+        if heap and new_gain < -gain and (-new_gain, size, i) > heap[0]:
+            heapq.heappush(heap, (-new_gain, size, i))
+            continue
+        covered.update(features)
+        kept.append(entries[i])
+    return kept
+
+
+def iter_paths(corpus):
+    with os.scandir(corpus) as it:
+        for entry in it:
+            if entry.is_file():
+                yield entry.path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corpus distillation preserving the compiler coverage")
+    parser.add_argument("corpus", help="corpus directory")
+    parser.add_argument("output", help="directory of the distilled corpus")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="amount of worker processes")
+    parser.add_argument("--source-only", action="store_true",
+                        help="deduplicate by the source hash only, without compiling")
+    parser.add_argument("--coverage-size", type=int, default=1 << 20, help="bits of the coverage maps")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    coverage_size = 0 if args.source_only else args.coverage_size
+    with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(coverage_size,)) as pool:
+        results = pool.map(extract_features, iter_paths(args.corpus), chunksize=64)
+        entries = [r for r in results if r is not None]
+    total = sum(1 for _ in iter_paths(args.corpus))
+
+    unique = deduplicate(entries)
+    kept = distill(unique)
+
+    os.makedirs(args.output, exist_ok=True)
+    for path, _, _, _ in kept:
+        shutil.copy2(path, args.output)
+
+    print(f"{total} entries, {len(entries)} converted, {len(unique)} unique sources, {len(kept)} kept "
+          f"in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Merges the EVM coverage maps of the stored run results per compiler, measuring the behavioural diversity
+of a campaign, and reports the coverage gained by each input strategy.
+
+Usage: PYTHONPATH=. python fuzz/tools/coverage_report.py [window in hours]
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+
+from fuzz.helpers.config import Config
+from fuzz.helpers.coverage_map import CoverageMap
+from fuzz.helpers.db import get_mongo_client
+
+
+def merge_coverage(run_results, compiler_names):
+    """
+    :return: map of the compiler names to the merged coverage maps of all function calls
+    """
+    merged = {}
+    for entry in run_results:
+        for name in compiler_names:
+            for deployment in entry.get(f"result_{name}") or []:
+                for calls in deployment.values() if isinstance(deployment, dict) else []:
+                    for call in calls:
+                        if "coverage" not in call:
+                            continue
+                        coverage_map = CoverageMap.from_compact(call["coverage"])
+                        merged.setdefault(name, CoverageMap(coverage_map.size)).update(coverage_map)
+    return merged
+
+
+def main():
+    conf = Config()
+    db = get_mongo_client(conf.db["host"], conf.db["port"])
+
+    query = {}
+    if len(sys.argv) > 1:
+        since = datetime.now(timezone.utc) - timedelta(hours=float(sys.argv[1]))
+        query = {"_id": {"$gte": ObjectId.from_datetime(since)}}
+
+    names = [c["name"] for c in conf.compilers]
+    merged = merge_coverage(db["run_results"].find(query), names)
+    for name in names:
+        count = merged[name].count() if name in merged else 0
+        print(f"{name}: {count} evm coverage bits")
+
+    for stats in db["coverage_stats"].find().sort([("compiler", 1), ("input_strategy", 1)]):
+        print(f"{stats['compiler']} strategy {stats['input_strategy']}: {stats['calls']} calls, "
+              f"{stats['new_bits']} new bits")
+
+
+if __name__ == "__main__":
+    main()
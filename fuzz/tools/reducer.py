@@ -0,0 +1,206 @@
+"""
+Reduces the contract of a discrepancy: delta debugging of the `Contract` proto message.
+Statements, functions, declarations and other repeated elements are dropped, and optional expressions are cleared,
+while the reduced message still reproduces the same discrepancy kind in-process (see `run_inprocess.py`).
+
+The candidates are executed in parallel by a few in-process evaluators, each with its own compiler servers,
+and the outcomes are cached by the serialized candidate.
+
+Usage:
+    PYTHONPATH=. python fuzz/tools/reducer.py <verification_results id> [-o reduced.json] [-j 4]
+    PYTHONPATH=. python fuzz/tools/reducer.py --message msg.json --compilers opt_gas opt_codesize --kind Storage
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+from google.protobuf.json_format import MessageToJson
+
+from fuzz.generators.run_inprocess import InProcessGenerator, parse_message
+from fuzz.helpers.config import Config
+from fuzz.helpers.db import get_mongo_client
+from fuzz.verifiers.verifier_api import VerifierBase
+
+# Input values are generated with the same seed for all candidates
+SEED = 0
+
+
+def edit_sites(msg, path=()):
+    """
+    Enumerates the reductions of the message top-down, the larger reductions of a field go first
+    :return: iterator over (path, field name, start, end) deleting a slice of a repeated field,
+        or clearing a singular message field if `start` is None
+    """
+    fields = msg.ListFields()
+    for field, value in fields:
+        if field.label == field.LABEL_REPEATED:
+            size = len(value)
+            while size >= 1:
+                for start in range(0, len(value), size):
+                    yield path, field.name, start, min(start + size, len(value))
+                size //= 2
+        elif field.type == field.TYPE_MESSAGE:
+            yield path, field.name, None, None
+
+    for field, value in fields:
+        if field.type != field.TYPE_MESSAGE:
+            continue
+        if field.label == field.LABEL_REPEATED:
+            for i, item in enumerate(value):
+                yield from edit_sites(item, path + ((field.name, i),))
+        else:
+            yield from edit_sites(value, path + ((field.name, None),))
+
+
+def apply_edit(msg, site):
+    """
+    :return: a copy of the message with the reduction applied
+    """
+    path, name, start, end = site
+    candidate = type(msg)()
+    candidate.CopyFrom(msg)
+    parent = candidate
+    for field_name, index in path:
+        parent = getattr(parent, field_name)
+        if index is not None:
+            parent = parent[index]
+    if start is None:
+        parent.ClearField(name)
+    else:
+        del getattr(parent, name)[start:end]
+    return candidate
+
+
+class Reducer:
+    def __init__(self, evaluators, kind):
+        """
+        :param evaluators: `InProcessGenerator` instances, one per parallel evaluation
+        :param kind: reproduced discrepancy kind, (compilers, verifier name) of `VerifierBase.discrepancy_kinds`
+        """
+        self.evaluators = evaluators
+        self.kind = kind
+        self.cache = {}
+        self.evaluations = 0
+        self.pool = ThreadPoolExecutor(len(evaluators))
+
+    def reproduces(self, msg) -> bool:
+        return self.evaluate([msg]) is not None
+
+    def evaluate(self, candidates):
+        """
+        Executes the candidates in parallel, the compilers run in the server processes
+        :return: the first candidate reproducing the discrepancy or None
+        """
+        messages = []
+        for candidate in candidates:
+            # inputs are generated in the main thread, so the seeded values don't depend on the scheduling
+            random.seed(SEED)
+            messages.append(self.evaluators[0].prepare_message(candidate))
+        records = self.pool.map(self.execute, self.evaluators, messages)
+
+        found = None
+        for candidate, record in zip(candidates, records):
+            results = record.get("results")
+            reproduced = results is not None and self.kind in VerifierBase.discrepancy_kinds(results)
+            self.cache[candidate.SerializeToString(deterministic=True)] = reproduced
+            if reproduced and found is None:
+                found = candidate
+        return found
+
+    def execute(self, evaluator, message):
+        if "error_type" in message:
+            return message
+        self.evaluations += 1
+        return evaluator.execute_message(message)
+
+    def reduce(self, msg):
+        """
+        Applies the reductions until none of them reproduces the discrepancy
+        """
+        while True:
+            reduced = self.reduce_once(msg)
+            if reduced is None:
+                return msg
+            msg = reduced
+
+    def reduce_once(self, msg):
+        batch = []
+        for site in edit_sites(msg):
+            candidate = apply_edit(msg, site)
+            if candidate.SerializeToString(deterministic=True) in self.cache:
+                continue
+            batch.append(candidate)
+            if len(batch) == len(self.evaluators):
+                found = self.evaluate(batch)
+                if found is not None:
+                    return found
+                batch = []
+        if batch:
+            return self.evaluate(batch)
+        return None
+
+    def close(self):
+        self.pool.shutdown()
+        for evaluator in self.evaluators:
+            evaluator.servers.close()
+
+
+def load_discrepancy(db, verification_id):
+    """
+    :return: tuple of the proto message and the discrepancy kinds of a `verification_results` entry
+    """
+    entry = db["verification_results"].find_one({"_id": ObjectId(verification_id)})
+    generation = db["compilation_log"].find_one({"_id": ObjectId(entry["generation_id"])})
+    return parse_message(generation["json_msg"].encode()), VerifierBase.discrepancy_kinds(entry["results"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta debugging of the proto message of a discrepancy")
+    parser.add_argument("verification_id", nargs="?", help="id of the verification_results entry")
+    parser.add_argument("--message", default=None, help="proto message file instead of the database entry")
+    parser.add_argument("--compilers", nargs=2, default=None, help="compilers of the reproduced discrepancy")
+    parser.add_argument("--kind", default=None, help="verifier name of the reproduced discrepancy")
+    parser.add_argument("-o", "--output", default="reduced.json", help="JSON file of the reduced message")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="amount of parallel evaluations")
+    parser.add_argument("-c", "--config", default=None, help="configuration file")
+    args = parser.parse_args()
+
+    if args.message is not None:
+        with open(args.message, "rb") as f:
+            msg = parse_message(f.read())
+        kinds = set()
+    else:
+        conf = Config(args.config) if args.config is not None else Config()
+        msg, kinds = load_discrepancy(get_mongo_client(conf.db["host"], conf.db["port"]), args.verification_id)
+
+    compilers = tuple(f"result_{name}" for name in args.compilers) if args.compilers is not None else None
+    matching = sorted(k for k in kinds
+                      if (compilers is None or k[0] == compilers) and (args.kind is None or k[1] == args.kind))
+    if matching:
+        kind = matching[0]
+    elif compilers is not None and args.kind is not None:
+        kind = (compilers, args.kind)
+    else:
+        raise ValueError(f"No discrepancy to reduce, recorded kinds: {sorted(kinds)}")
+
+    names = [field[len("result_"):] for field in kind[0]]
+    reducer = Reducer([InProcessGenerator(args.config, names) for _ in range(args.jobs)], kind)
+    start = time.perf_counter()
+    try:
+        if not reducer.reproduces(msg):
+            print(f"The discrepancy {kind} isn't reproduced in-process")
+            return
+        reduced = reducer.reduce(msg)
+    finally:
+        reducer.close()
+
+    with open(args.output, "w") as f:
+        f.write(MessageToJson(reduced))
+    print(f"{kind}: {msg.ByteSize()} -> {reduced.ByteSize()} bytes, {reducer.evaluations} evaluations, "
+          f"{len(reducer.cache)} cached candidates in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Background retention job of the clean documents, i.e. the contracts verified without discrepancies.
+Anything linked to a discrepancy is kept in full.
+
+- `compact` retention: the clean documents are compacted to a summary once `retention.clean_after_hours` passed
+  since their verification. `compilation_log` keeps the source hash, the generator version and the timings,
+  `run_results` and `verification_results` drop the results.
+- `expire` retention: the verifier sets `expire_at` of the clean documents and the TTL indexes delete them.
+
+The job also migrates the documents verified before the retention was enabled in batches.
+
+Usage: PYTHONPATH=. python fuzz/tools/retention.py [--once] [-c config.yml]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from fuzz.helpers.config import Config
+from fuzz.helpers.db import get_mongo_client
+from fuzz.helpers.retention import (RETENTION_COMPACT, RETENTION_EXPIRE, RETENTION_NONE, EXPIRE_FIELD,
+                                    retention_mode, clean_after, init_ttl_indexes)
+from fuzz.verifiers.verifier_api import VerifierBase
+
+# Fields of a compacted `compilation_log` document besides the summary
+COMPACTED_LOG_FIELDS = ("_id", "generator_version", "error_type", EXPIRE_FIELD)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def source_hash(log) -> str:
+    sources = sorted((k, v) for k, v in log.items() if k.startswith("generation_result"))
+    return hashlib.blake2b(json.dumps(sources).encode(), digest_size=16).hexdigest()
+
+
+def compact_log(log, handled_at) -> dict:
+    """
+    :return: the update compacting a `compilation_log` document to the summary
+    """
+    generated_at = log["_id"].generation_time
+    summary = {
+        "source_hash": source_hash(log),
+        "generated_at": generated_at,
+        "handled_at": handled_at,
+        "compacted": True,
+    }
+    if handled_at is not None:
+        summary["latency"] = (handled_at.replace(tzinfo=timezone.utc) - generated_at).total_seconds()
+    dropped = {f: "" for f in log if f not in COMPACTED_LOG_FIELDS and not f.startswith("compiled_")}
+    return {"$set": summary, "$unset": dropped}
+
+
+class RetentionJob:
+    def __init__(self, config_file=None):
+        self.conf = Config(config_file) if config_file is not None else Config()
+        self.mode = retention_mode(self.conf)
+        self.clean_after = clean_after(self.conf)
+        self.batch_size = self.conf.retention.get("batch_size", DEFAULT_BATCH_SIZE)
+        self.result_fields = [f"result_{c['name']}" for c in self.conf.compilers]
+        self.logger = logging.getLogger("retention")
+        logging.basicConfig(format='%(name)s:%(levelname)s:%(asctime)s:%(message)s',
+                            level=getattr(logging, self.conf.verbosity))
+        self.init_db()
+
+    def run(self, once=False):
+        if self.mode == RETENTION_NONE:
+            self.logger.info("Retention is disabled")
+            return
+        self.run_results.create_index([("has_discrepancy", 1), ("handled_at", 1)])
+        self.verification_results.create_index("generation_id")
+        if self.mode == RETENTION_EXPIRE:
+            init_ttl_indexes(self.run_results, self.verification_results, self.compilation_log)
+        while True:
+            migrated = self.migrate_batch()
+            compacted = self.compact_batch() if self.mode == RETENTION_COMPACT else 0
+            if migrated or compacted:
+                self.logger.info("Migrated %s, compacted %s documents", migrated, compacted)
+                continue
+            if once:
+                return
+            time.sleep(60)
+
+    def migrate_batch(self) -> int:
+        """
+        Flags the results verified before the retention was enabled
+        :return: amount of the migrated results
+        """
+        entries = list(self.run_results.find({"is_handled": True, "has_discrepancy": {"$exists": False},
+                                              "invalid": {"$ne": True}},
+                                             {"generation_id": 1}).limit(self.batch_size))
+        if len(entries) == 0:
+            return 0
+
+        generation_ids = [e["generation_id"] for e in entries]
+        discrepancies = set()
+        for verification in self.verification_results.find({"generation_id": {"$in": generation_ids}},
+                                                            {"generation_id": 1, "results": 1}):
+            if VerifierBase.has_discrepancy(verification["results"]):
+                discrepancies.add(verification["generation_id"])
+
+        # the retention period starts now
+        now = datetime.now(timezone.utc)
+        clean = [g for g in generation_ids if g not in discrepancies]
+        updates = []
+        for entry in entries:
+            update = {"has_discrepancy": entry["generation_id"] in discrepancies, "handled_at": now}
+            if self.mode == RETENTION_EXPIRE and not update["has_discrepancy"]:
+                update[EXPIRE_FIELD] = now + self.clean_after
+            updates.append(UpdateOne({"_id": entry["_id"]}, {"$set": update}))
+        self.run_results.bulk_write(updates, ordered=False)
+
+        if self.mode == RETENTION_EXPIRE and len(clean) != 0:
+            expiration = {"$set": {EXPIRE_FIELD: now + self.clean_after}}
+            self.verification_results.update_many({"generation_id": {"$in": clean}}, expiration)
+            self.compilation_log.update_many({"_id": {"$in": [ObjectId(g) for g in clean]}}, expiration)
+        return len(entries)
+
+    def compact_batch(self) -> int:
+        """
+        Compacts the clean documents verified more than `clean_after_hours` ago
+        :return: amount of the compacted contracts
+        """
+        cutoff = datetime.now(timezone.utc) - self.clean_after
+        entries = list(self.run_results.find(
+            {"is_handled": True, "has_discrepancy": False, "compacted": {"$ne": True},
+             "handled_at": {"$lt": cutoff}},
+            {"generation_id": 1, "handled_at": 1}).limit(self.batch_size))
+        if len(entries) == 0:
+            return 0
+
+        handled_at = {e["generation_id"]: e["handled_at"] for e in entries}
+        log_updates = [UpdateOne({"_id": log["_id"]}, compact_log(log, handled_at[str(log["_id"])]))
+                       for log in self.compilation_log.find(
+                           {"_id": {"$in": [ObjectId(g) for g in handled_at]}, "compacted": {"$ne": True}})]
+        if len(log_updates) != 0:
+            self.compilation_log.bulk_write(log_updates, ordered=False)
+
+        self.verification_results.update_many(
+            {"generation_id": {"$in": list(handled_at)}},
+            {"$set": {"compacted": True}, "$unset": {"results": ""}})
+        self.run_results.update_many(
+            {"_id": {"$in": [e["_id"] for e in entries]}},
+            {"$set": {"compacted": True}, "$unset": {f: "" for f in self.result_fields}})
+        return len(entries)
+
+    def init_db(self):
+        db_client = get_mongo_client(self.conf.db["host"], self.conf.db["port"])
+        self.compilation_log = db_client["compilation_log"]
+        self.run_results = db_client["run_results"]
+        self.verification_results = db_client["verification_results"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retention of the clean documents")
+    parser.add_argument("--once", action="store_true", help="stop when there is nothing to migrate or compact")
+    parser.add_argument("-c", "--config", default=None, help="configuration file")
+    args = parser.parse_args()
+
+    RetentionJob(args.config).run(args.once)
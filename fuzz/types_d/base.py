@@ -12,6 +12,10 @@ class BaseType:
     def vyper_type(self):
         raise NotImplementedError()
 
+    @property
+    def abi_type(self):
+        raise NotImplementedError()
+
     def generate(self):
         raise NotImplementedError()
 
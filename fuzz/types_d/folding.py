@@ -0,0 +1,122 @@
+import math
+import operator
+
+_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+    "**": operator.pow,
+    "&": operator.and_,
+    "|": operator.or_,
+    "^": operator.xor,
+    "<<": operator.lshift,
+    ">>": operator.rshift,
+}
+
+# results of `**` and `<<` beyond this bit length are out of bounds of any type and aren't computed
+MAX_BITS = 1024
+
+
+class Folded:
+    """
+    Text of an expression with the value the text evaluates to, `None` if it isn't a constant
+    or the evaluation fails. The values follow the Python semantics of the text, e.g. `-2 ** 2` is `-4`.
+    `bounds` are the bounds of the value at the runtime, see `fuzz/converters/ranges.py`, None if unknown.
+    """
+    __slots__ = ("text", "value", "negations", "base", "op", "left", "right", "bounds")
+
+    def __init__(self, text, value=None, negations=0, base=None, op=None, left=None, right=None):
+        self.text = text
+        self.value = value
+        # leading unary minuses and the value without them, a power binds tighter than them
+        self.negations = negations
+        self.base = value if negations == 0 else base
+        # operation of an unparenthesized binary expression, a leading unary minus applies to its left operand
+        self.op = op
+        self.left = left
+        self.right = right
+        self.bounds = None
+
+    def __repr__(self):
+        return f"Folded({self.text!r}, {self.value!r})"
+
+
+def opaque(text) -> Folded:
+    return Folded(text)
+
+
+def literal(text) -> Folded:
+    if text.startswith("-"):
+        folded = negate(literal(text[1:]))
+    else:
+        try:
+            value = int(text)
+        except ValueError:
+            value = float(text)
+            # `nan` or `inf` aren't literals
+            if not math.isfinite(value):
+                value = None
+        folded = Folded(text, value)
+    if _is_int(folded.value):
+        folded.bounds = (folded.value, folded.value)
+    elif folded.value is not None and text.endswith(".0"):
+        # the integral decimal literals are exact, unlike their float values
+        folded.bounds = (int(text[:-2]), int(text[:-2]))
+    return folded
+
+
+def parenthesize(folded) -> Folded:
+    result = Folded(f"({folded.text})", folded.value)
+    result.bounds = folded.bounds
+    return result
+
+
+def negate(folded) -> Folded:
+    """
+    :return: the expression prefixed with a unary minus
+    """
+    text = f"-{folded.text}"
+    if folded.op is not None and folded.op != "**":
+        left = negate(folded.left)
+        return Folded(text, _apply(folded.op, left.value, folded.right.value), op=folded.op, left=left,
+                      right=folded.right)
+    value = -folded.value if folded.value is not None else None
+    return Folded(text, value, folded.negations + 1, folded.base)
+
+
+def binary(left, op, right, modulus=None) -> Folded:
+    """
+    :param modulus: modulus of the bounds the result is checked against, the results of `**` and `<<`
+        exceeding `MAX_BITS` are replaced by an out of bounds value of the same residue
+    """
+    text = f"{left.text} {op} {right.text}"
+    if op != "**":
+        value = _apply(op, left.value, right.value, modulus)
+        return Folded(text, value, op=op, left=left, right=right)
+
+    value = _apply(op, left.base, right.value, modulus)
+    for _ in range(left.negations):
+        value = -value if value is not None else None
+    return Folded(text, value, op=op, left=left, right=right)
+
+
+def _apply(op, left, right, modulus=None):
+    if left is None or right is None:
+        return None
+    if _is_int(left) and _is_int(right) and right > 0 and left not in (0, 1, -1):
+        if op == "**" and right * (abs(left).bit_length() - 1) > MAX_BITS:
+            return pow(left, right, modulus) + modulus if modulus is not None else None
+        # the shifted value is a multiple of the power of two modulus
+        if op == "<<" and right > MAX_BITS:
+            return (modulus if left > 0 else -modulus) if modulus is not None else None
+    try:
+        return _OPERATORS[op](left, right)
+    except Exception:
+        return None
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
@@ -1,4 +1,5 @@
 from fuzz.types_d.base import BaseType
+from fuzz.types_d.folding import binary, literal, negate
 from fuzz.types_d.value_generator import BytesMRandomGen, BytesRandomGen, IntRandomGen, BoolRandomGen, StringRandomGen, \
     AddressRandomGen, DecimalRandomGen
 from fuzz.types_d.literal_value_generator import BytesLiteralGen, AddressLiteralGen, BytesMLiteralGen, IntLiteralGen, \
@@ -31,6 +32,10 @@ class Bytes(BaseType):
     def vyper_type(self):
         return f"Bytes[{self._m}]"
 
+    @property
+    def abi_type(self):
+        return "bytes"
+
     def generate(self):
         return self._value_generator.generate(self)
 
@@ -50,6 +55,10 @@ class BytesM(Bytes):
     def vyper_type(self):
         return f"bytes{self._m}"
 
+    @property
+    def abi_type(self):
+        return self.vyper_type
+
 
 class Int(BaseType):
     def __init__(self, n=256, signed=False):
@@ -79,6 +88,10 @@ class Int(BaseType):
         type_name = f"{'' if self._signed else 'u'}int{self._n}"
         return type_name
 
+    @property
+    def abi_type(self):
+        return self.vyper_type
+
     def generate(self):
         return self._value_generator.generate(self)
 
@@ -86,51 +99,57 @@ class Int(BaseType):
         return self._literal_generator.generate(self._n, self._signed, value)
 
     def check_binop_bounds(self, left, bin_op, right):
-        try:
-            val_left = eval(left)
-        except:
-            val_left = None  
-
-        try:
-            val_right = eval(right)
-        except:
-            val_right = None 
+        """
+        :param left: `Folded` left operand
+        :param right: `Folded` right operand
+        """
+        val_left = left.value
+        val_right = right.value
 
         # not sure how exactly change affected values
         if bin_op == "**":
             if val_right is not None and val_right < 0:
-                right = f"-{right}"
+                right = negate(right)
 
             if val_right is None and val_left is None:
-                left = "1"
+                left = literal("1")
 
         if (bin_op == "<<" or bin_op == ">>") and self._n != 256:
             bin_op = "+"
 
         if bin_op == "<<" or bin_op == ">>":
             if val_right is not None and val_right > 256:
-                right = f"{val_right % 257}"
+                right = literal(f"{val_right % 257}")
 
-        if bin_op == "/" or bin_op == "%":
+        if bin_op in ("/", "//", "%"):
             if val_right is not None and val_right == 0:
-                right = "1"
+                right = literal("1")
 
         return left, bin_op, right
 
+    def fold_binop(self, left, bin_op, right):
+        return binary(left, bin_op, right, 2 ** self._n)
+
     def check_literal_bounds(self, value):
+        """
+        :param value: `Folded` expression
+        :return: `Folded` expression, a literal if the constant is out of bounds
+        """
+        e_val = value.value
+        if e_val is None:
+            return value
+
+        # it might be a float in case conversion from Decimal to Int
+        # FIXME: it seems like a design flaw though
+        if isinstance(e_val, float):
+            if e_val < 0 and not self.signed:
+                return negate(value)
+            return value
+        low, up = self._literal_generator._get_value_boundaries(self._n, self._signed)
         try:
-            e_val = eval(value)
-
-            # it might be a float in case conversion from Decimal to Int
-            # FIXME: it seems like a design flaw though
-            if isinstance(e_val, float):
-                if e_val < 0 and not self.signed:
-                    return f"-{value}"
-                return value
-            low, up = self._literal_generator._get_value_boundaries(self._n, self._signed)
             if low > e_val or e_val > up:
-                return self._literal_generator.generate(self._n, self._signed, e_val)
-        except:
+                return literal(self._literal_generator.generate(self._n, self._signed, e_val))
+        except TypeError:
             pass
         return value
 
@@ -144,6 +163,10 @@ class Bool(BaseType):
     def vyper_type(self):
         return "bool"
 
+    @property
+    def abi_type(self):
+        return self.vyper_type
+
     def generate(self):
         return self._value_generator.generate(self)
 
@@ -160,6 +183,10 @@ class Decimal(BaseType):
     def vyper_type(self):
         return "decimal"
 
+    @property
+    def abi_type(self):
+        return "fixed168x10"
+
     def generate(self):
         return self._value_generator.generate(self)
 
@@ -177,6 +204,10 @@ class String(Bytes):
     def vyper_type(self):
         return f"String[{self._m}]"
 
+    @property
+    def abi_type(self):
+        return "string"
+
 
 class Address(BaseType):
     def __init__(self):
@@ -187,6 +218,10 @@ class Address(BaseType):
     def vyper_type(self):
         return "address"
 
+    @property
+    def abi_type(self):
+        return self.vyper_type
+
     def generate(self):
         return self._value_generator.generate(self)
 
@@ -214,6 +249,10 @@ class FixedList(BaseType):
     def vyper_type(self):
         return f"{self._base_type.vyper_type}[{self._size}]"
 
+    @property
+    def abi_type(self):
+        return f"{self._base_type.abi_type}[{self._size}]"
+
     @property
     def name(self):
         #return self.__class__.__name__.upper() + self._base_type.name
@@ -239,6 +278,10 @@ class DynArray(FixedList):
     def vyper_type(self):
         return f"DynArray[{self._base_type.vyper_type},{self._size}]"
 
+    @property
+    def abi_type(self):
+        return f"{self._base_type.abi_type}[]"
+
     @property
     def name(self):
         #return self.__class__.__name__.upper() + self._base_type.name
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import re
+
+# Values stripped from the discrepancy messages, the order matters: hex numbers before decimals
+_VALUE_PATTERNS = (
+    (re.compile(r"0x[0-9a-fA-F]*"), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"(?<![\w<])-?\d+(\.\d+)?"), "<num>"),
+)
+# sequences of values, e.g. the storage slots, are collapsed regardless of their length
+_VALUE_SEQUENCE = re.compile(r"(<\w+>)([\s,:]*<\w+>)+")
+_SPACES = re.compile(r"\s+")
+
+MAX_MESSAGE_LENGTH = 300
+
+# Kind of the deployment (compilation error) discrepancies
+DEPLOYMENT = "Deployment"
+
+
+def normalize_message(message) -> str:
+    """
+    Strips the values, addresses and strings out of the discrepancy message,
+    so the discrepancies of the same bug share the message
+    """
+    if message is None:
+        return ""
+    message = str(message)
+    for pattern, placeholder in _VALUE_PATTERNS:
+        message = pattern.sub(placeholder, message)
+    message = _VALUE_SEQUENCE.sub(r"\1...", message)
+    return _SPACES.sub(" ", message).strip()[:MAX_MESSAGE_LENGTH]
+
+
+def discrepancies(results):
+    """
+    :param results: verification results of a contract
+    :return: iterator over (compilers, verifier name, message) of the discrepancies
+    """
+    for r in results:
+        compilers = tuple(r["compilers"])
+        pair_results = r["results"]
+        if isinstance(pair_results, dict):
+            for name, err in pair_results.items():
+                if err is not None:
+                    yield compilers, name, err
+        elif pair_results is not None:
+            yield compilers, DEPLOYMENT, pair_results
+
+
+def cluster_signature(compilers, kind, normalized_message) -> str:
+    payload = json.dumps([list(compilers), kind, normalized_message], separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def contract_clusters(results) -> dict:
+    """
+    :return: map of the cluster signatures of a contract to (compilers, kind, normalized message),
+        a contract counts once per cluster
+    """
+    clusters = {}
+    for compilers, kind, message in discrepancies(results):
+        normalized = normalize_message(message)
+        clusters.setdefault(cluster_signature(compilers, kind, normalized), (compilers, kind, normalized))
+    return clusters
@@ -1,78 +1,282 @@
 import logging
+import os
+import socket
 import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from fuzz.helpers.config import Config
 from fuzz.helpers.db import get_mongo_client
+from fuzz.helpers.retention import RETENTION_EXPIRE, EXPIRE_FIELD, retention_mode, clean_after, init_ttl_indexes
+from fuzz.verifiers.clustering import DEPLOYMENT, contract_clusters, discrepancies
 
 class VerifierException(Exception):
     pass
 
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+# Verifier instance of a pool worker process, see `VerifierBase.init_pool`
+_worker_verifier = None
+
+
+def _init_worker(verifier_cls, config_file):
+    global _worker_verifier
+    _worker_verifier = verifier_cls(config_file)
+
+
+def _verify_in_worker(res):
+    return _worker_verifier.verify_result(res)
+
+
 class VerifierBase:
 
     RUNTIME_ERROR = "runtime_error"
+    # Must match `RunnerBase.IDENTICAL_TO`
+    IDENTICAL_TO = "identical_to"
+    # Must match `RunnerBase.TIMEOUT_ERROR` and `RunnerBase.WORKER_ERROR`
+    TIMEOUT_ERROR = "timeout_error"
+    WORKER_ERROR = "worker_error"
+
+    # Add new verifiers to the mapping: (name, result field, verifier method)
+    # Cheap fields go first, so a short-circuited comparison skips the storage
+    VERIFIERS = (
+        ("Gas", "consumed_gas", "gas_verifier"),
+        ("Return_Value", "return_value", "return_value_verifier"),
+        ("Storage", "state", "storage_verifier"),
+        ("Memory", "memory", "memory_verifier"),
+    )
+
+    # Kind of the discrepancies of the executions killed on some compilers only
+    TIMEOUT = "Timeout"
+
+    # Outcomes of `verify_result`
+    NOT_READY = "not_ready"
+    INVALID = "invalid"
+    VERIFIED = "verified"
+
+    # Equal fingerprints of the results are considered as no discrepancy
+    # The fingerprint covers `FINGERPRINT_FIELDS` only,
+    # disable the fast path when verifying other fields, e.g. gas or memory
+    FINGERPRINT_FAST_PATH = True
+
+    DEFAULT_WORKERS = 1
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_LEASE_TIMEOUT = 300
+    DEFAULT_CLUSTER_EXEMPLARS = 5
 
     def __init__(self, config_file=None):
+        self.config_file = config_file
         self.conf = Config(config_file) if config_file is not None else Config()
         self.init_logger()
+        self.init_settings()
         self.init_db()
 
     def start_verifier(self):
+        self.init_indexes()
+        pool = self.init_pool()
         while True:
-            unhandled_results = list(self.results_collection.find({"is_handled": False}))
-            self.logger.debug(f"Unhandled results received: {unhandled_results}")
-
-            verification_results = []
-            handled_ids = []
-            for res in unhandled_results:
-                self.logger.info(f"Handling result: {res['generation_id']}")
-                self.logger.debug(res)
-                if not self.ready_to_handle(res):
-                    self.logger.debug("%s is not ready yet", res["generation_id"])
-                    continue
-
-                if not self.is_valid(res):
-                    continue
-
-                has_errors, results = self.check_deploy_errors(res)
-                if has_errors:
-                    verification_results.append({"generation_id": res["generation_id"], "results": results})
-                    continue
-
-                reshaped_res = self.reshape_data(res)
-                _r = self.verify_results(reshaped_res)
-                verification_results.append({"generation_id": res["generation_id"], "results": _r})
-                handled_ids.append(res["_id"])
-
-            if len(verification_results) != 0:
-                self.verification_results_collection.insert_many(verification_results)
-
-                self.results_collection.update_many(
-                    {"_id": {"$in": handled_ids}},
-                    {"$set": {"is_handled": True}}
-                )
-            time.sleep(5)
+            claimed_results = self.claim_results()
+            self.logger.debug(f"Claimed results: {claimed_results}")
+
+            if len(claimed_results) == 0:
+                time.sleep(5)
+                continue
+
+            self.handle_results(claimed_results, pool)
+
+    def claim_results(self) -> list:
+        """
+        Claims a batch of unhandled results for this instance.
+        A result is claimable if nobody holds it or the lease of its holder has expired,
+        so the results of a crashed instance are taken over after `lease_timeout` seconds.
+        """
+        now = datetime.now(timezone.utc)
+        claimable = {
+            "is_handled": False,
+            "$or": [
+                {"claimed_by": None},
+                {"claimed_at": {"$lt": now - timedelta(seconds=self.lease_timeout)}}
+            ]
+        }
+        candidates = [r["_id"] for r in
+                      self.results_collection.find(claimable, {"_id": 1}).limit(self.batch_size)]
+        if len(candidates) == 0:
+            return []
+
+        # the filter is re-evaluated atomically per document,
+        # hence a result is claimed by one instance only
+        self.results_collection.update_many(
+            {"_id": {"$in": candidates}, **claimable},
+            {"$set": {"claimed_by": self.instance_id, "claimed_at": now}}
+        )
+        return list(self.results_collection.find(
+            {"_id": {"$in": candidates}, "claimed_by": self.instance_id}))
+
+    def handle_results(self, claimed_results, pool=None):
+        if pool is None:
+            outcomes = map(self.verify_result, claimed_results)
+        else:
+            chunksize = max(1, len(claimed_results) // (self.workers * 4))
+            outcomes = pool.map(_verify_in_worker, claimed_results, chunksize=chunksize)
+
+        now = datetime.now(timezone.utc)
+        # the clean entries expire with the TTL retention
+        expiration = {EXPIRE_FIELD: now + self.clean_after} if self.retention_mode == RETENTION_EXPIRE else {}
+        # handled states of the `run_results` entries
+        states = {
+            "clean": {"has_discrepancy": False, **expiration},
+            "discrepancy": {"has_discrepancy": True},
+            # the invalid results aren't compared, they are kept for the triage of the runners
+            "invalid": {"invalid": True},
+        }
+        verification_results = []
+        handled_ids = {state: [] for state in states}
+        clean_generation_ids = []
+        for res, (status, results) in zip(claimed_results, outcomes):
+            if status == self.NOT_READY:
+                # the lease is kept, a runner reporting its result releases it
+                self.logger.debug("%s is not ready yet", res["generation_id"])
+                continue
+            if status == self.INVALID:
+                handled_ids["invalid"].append(res["_id"])
+                continue
+            has_discrepancy = self.has_discrepancy(results)
+            handled_ids["discrepancy" if has_discrepancy else "clean"].append(res["_id"])
+            # keyed by the generation, a result verified again after an expired lease isn't recorded twice
+            entry = {"_id": ObjectId(res["generation_id"]), "generation_id": res["generation_id"], "results": results}
+            if not has_discrepancy:
+                clean_generation_ids.append(ObjectId(res["generation_id"]))
+                entry.update(expiration)
+            verification_results.append(entry)
+
+        if len(verification_results) != 0:
+            inserted = self.insert_verification_results(verification_results)
+            if self.clustering:
+                self.update_clusters(inserted)
+
+        for state, ids in handled_ids.items():
+            if len(ids) == 0:
+                continue
+            self.results_collection.update_many(
+                {"_id": {"$in": ids}, "claimed_by": self.instance_id},
+                {"$set": {"is_handled": True, "handled_at": now, **states[state]},
+                 "$unset": {"claimed_by": "", "claimed_at": ""}}
+            )
+
+        if expiration and len(clean_generation_ids) != 0:
+            self.compilation_log.update_many({"_id": {"$in": clean_generation_ids}}, {"$set": expiration})
+
+    def insert_verification_results(self, verification_results) -> list:
+        """
+        :return: the entries inserted by this instance, the entries recorded before by another instance are skipped
+        """
+        try:
+            self.verification_results_collection.insert_many(verification_results, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+            self.logger.debug("%s results were verified by another instance", len(duplicates))
+            return [entry for i, entry in enumerate(verification_results) if i not in duplicates]
+        return verification_results
+
+    def update_clusters(self, verification_results):
+        """
+        Counts the contracts of the discrepancy clusters in bulk, one update per cluster of the batch
+        """
+        clusters = {}
+        for entry in verification_results:
+            for signature, key in contract_clusters(entry["results"]).items():
+                cluster = clusters.setdefault(signature, {"key": key, "count": 0, "exemplars": []})
+                cluster["count"] += 1
+                if len(cluster["exemplars"]) < self.cluster_exemplars:
+                    cluster["exemplars"].append({"verification_id": entry["_id"],
+                                                 "generation_id": entry["generation_id"]})
+        if len(clusters) == 0:
+            return
+
+        now = datetime.now(timezone.utc)
+        self.clusters_collection.bulk_write([
+            UpdateOne({"_id": signature}, {
+                "$setOnInsert": {"compilers": list(cluster["key"][0]), "kind": cluster["key"][1],
+                                 "message": cluster["key"][2], "first_seen": now},
+                "$set": {"last_seen": now},
+                "$inc": {"count": cluster["count"]},
+                # the earliest exemplars are kept
+                "$push": {"exemplars": {"$each": cluster["exemplars"], "$slice": self.cluster_exemplars}},
+            }, upsert=True)
+            for signature, cluster in clusters.items()], ordered=False)
+
+    def verify_result(self, res):
+        """
+        Verifies a single `run_results` entry
+        :return: a tuple of the outcome (`NOT_READY`, `INVALID` or `VERIFIED`) and the verification results
+        """
+        self.logger.info(f"Handling result: {res['generation_id']}")
+        self.logger.debug(res)
+        res = self.resolve_identical(res)
+        # a reference to the runner itself or to an unknown runner is never resolved
+        if res is None:
+            return self.INVALID, None
+        if not self.ready_to_handle(res):
+            return self.NOT_READY, None
+
+        # the execution time depends on the load of the runners,
+        # the results of an execution killed on every compiler aren't compared
+        killed = [self.killed_error(res[f]) for f in self.target_fields()]
+        if all(killed) or not self.is_valid(res):
+            return self.INVALID, None
+        if any(killed):
+            return self.VERIFIED, self.check_killed(killed)
+
+        has_errors, results = self.check_deploy_errors(res)
+        if has_errors:
+            return self.VERIFIED, results
+
+        return self.VERIFIED, self.compare_results(res)
+
+    def resolve_identical(self, _res):
+        """
+        A runner skips the execution of a bytecode identical to the bytecode of a peer,
+        the results of the peer are taken instead, so the comparison is a trivial pass
+        :return: the results, None if a reference can't be resolved
+        """
+        fields = self.target_fields()
+        resolved = None
+        for f in fields:
+            if not self.is_identical(_res.get(f)):
+                continue
+            owner = f"result_{_res[f][self.IDENTICAL_TO]}"
+            if owner == f or owner not in fields:
+                return None
+            # the results of the peer aren't reported yet, the reference stays until they are
+            if owner not in _res or self.is_identical(_res[owner]):
+                continue
+            if resolved is None:
+                resolved = dict(_res)
+            resolved[f] = _res[owner]
+        return _res if resolved is None else resolved
 
     def check_deploy_errors(self, _res):
-        deploy_errors = []
         fields = self.target_fields()
+        deploy_results = []
 
         has_error = False
-        # reshaping: init->[compilers]
-        for f in fields:
-            for j, depl in enumerate(_res[f]):
-                if j > len(deploy_errors) - 1:
-                    deploy_errors.append([])
-                deploy_errors[j].append(_res[f][j].get("deploy_error", None))
-                if deploy_errors[j][-1] is not None:
-                    has_error = True
-
-        deploy_results = []
-        for i, errors in enumerate(deploy_errors):
-            for j, error in enumerate(errors):
-                if j == len(errors) - 1:
-                    break
+        # the deployments of all compilers side by side: init->[compilers]
+        for i, deployments in enumerate(zip(*(_res[f] for f in fields))):
+            errors = [depl.get("deploy_error", None) for depl in deployments]
+            if not has_error:
+                has_error = any(e is not None for e in errors)
+            for j in range(len(errors) - 1):
                 verify_result = self.verify_and_catch(self.compilation_error_handler,
-                                                    (errors[j], errors[j+1]))
+                                                      (errors[j], errors[j + 1]))
                 deploy_results.append({
                     "compilers": (fields[j], fields[j + 1]),
                     "deployment": i,
@@ -80,44 +284,82 @@ class VerifierBase:
                 })
         return has_error, deploy_results
 
-    def reshape_data(self, _res):
-        compilers = self.target_fields()
-        result = {}
-
-        for i, compiler in enumerate(compilers):
-            compiler_data = _res[compiler]
-            for j, depl in enumerate(compiler_data):
-                for func_name, results in depl.items():
-                    if func_name not in result:
-                        result[func_name] = []
-                    if j > len(result[func_name]) - 1:
-                        result[func_name].append([])
-                    for k, r in enumerate(results):
-                        if k > len(result[func_name][j]) - 1:
-                            result[func_name][j].append([])
-                        result[func_name][j][k].append(r)
-
-        return result
-
-    def verify_results(self, data):
+    def check_killed(self, killed):
+        """
+        :param killed: the errors of the killed executions by compiler, None for a completed one
+        """
+        fields = self.target_fields()
+        return [{
+            "compilers": (fields[j], fields[j + 1]),
+            "results": {self.TIMEOUT: self.verify_and_catch(self.killed_execution_handler,
+                                                            (killed[j], killed[j + 1]))}
+        } for j in range(len(fields) - 1)]
+
+    def compare_results(self, _res):
+        """
+        Compares the function call results of the neighbouring compilers.
+        The per-compiler results are zipped in place, so no intermediate structure is built.
+        """
         compilers = self.target_fields()
+        compilers_data = [_res[c] for c in compilers]
+        # keeps the order of the first appearance
+        func_names = dict.fromkeys(fn for data in compilers_data for depl in data for fn in depl)
+
         results = []
-        for func_name, deployments in data.items():
-            for i, depl in enumerate(deployments):
-                for k, compilers_res in enumerate(depl):
-                    for j, _res in enumerate(compilers_res):
-                        if j == len(compilers_res) - 1:
-                            break
-                        d = self.verify_two_results(_res, compilers_res[j + 1])
+        for func_name in func_names:
+            for i, deployments in enumerate(zip(*compilers_data)):
+                calls = zip(*(depl.get(func_name, ()) for depl in deployments))
+                for k, compilers_res in enumerate(calls):
+                    all_equal = self.fingerprints_match(compilers_res)
+                    for j in range(len(compilers_res) - 1):
+                        if all_equal:
+                            pair_results = dict.fromkeys(name for name, _, _ in self._verifiers)
+                        else:
+                            pair_results = self.verify_two_results(compilers_res[j], compilers_res[j + 1])
                         results.append({
                             "compilers": (compilers[j], compilers[j + 1]),
                             "function": func_name,
                             "deployment": i,
                             "params_set": k,
-                            "results": d
+                            "results": pair_results
                         })
         return results
 
+    @staticmethod
+    def has_discrepancy(results) -> bool:
+        """
+        :param results: verification results of a contract
+        """
+        for r in results:
+            pair_results = r["results"]
+            if isinstance(pair_results, dict):
+                if any(err is not None for err in pair_results.values()):
+                    return True
+            elif pair_results is not None:
+                return True
+        return False
+
+    DEPLOYMENT = DEPLOYMENT
+
+    @staticmethod
+    def discrepancy_kinds(results) -> set:
+        """
+        :param results: verification results of a contract
+        :return: set of (compilers, verifier name) of the discrepancies, the deployment errors are named `DEPLOYMENT`
+        """
+        return {(compilers, kind) for compilers, kind, _ in discrepancies(results)}
+
+    def killed_error(self, results):
+        """
+        :param results: results of a compiler
+        :return: the error of an execution killed by the runner, None if the execution has completed
+        """
+        for depl in results:
+            for error in (self.TIMEOUT_ERROR, self.WORKER_ERROR):
+                if error in depl:
+                    return f"{error}: {depl[error]}"
+        return None
+
     def is_valid(self, _res):
         fields = self.target_fields()
         for f in fields:
@@ -128,26 +370,32 @@ class VerifierBase:
 
     def ready_to_handle(self, _res) -> bool:
         fields = self.target_fields()
-        return all(f in _res for f in fields)
+        return all(f in _res and not self.is_identical(_res[f]) for f in fields)
+
+    def is_identical(self, value) -> bool:
+        return isinstance(value, dict) and self.IDENTICAL_TO in value
 
     # Must match run_results_collection setting in the runner callback
     def target_fields(self) -> list:
         return [f"result_{c['name']}" for c in self.conf.compilers]
 
-    # Add new verifiers to the mapping
+    def fingerprints_match(self, compilers_res) -> bool:
+        if not self.FINGERPRINT_FAST_PATH:
+            return False
+        fingerprint = compilers_res[0].get("fingerprint")
+        if fingerprint is None:
+            return False
+        return all(r.get("fingerprint") == fingerprint for r in compilers_res)
+
     def verify_two_results(self, _res0, _res1):
         if self.RUNTIME_ERROR in _res0 or self.RUNTIME_ERROR in _res1:
             self.runtime_error_handler(_res0, _res1)
             return {}
-        verifiers = {
-            "Storage": (self.storage_verifier, (_res0["state"], _res1["state"])),
-            "Memory": (self.memory_verifier, (_res0["memory"], _res1["memory"])),
-            "Gas": (self.gas_verifier, (_res0["consumed_gas"], _res1["consumed_gas"])),
-            "Return_Value": (self.return_value_verifier, (_res0["return_value"], _res1["return_value"]))
-        }
         d = {}
-        for name, (verifier, params) in verifiers.items():
-            d[name] = self.verify_and_catch(verifier, params)
+        for name, field, verifier in self._verifiers:
+            d[name] = self.verify_and_catch(verifier, (_res0[field], _res1[field]))
+            if d[name] is not None and self.short_circuit:
+                break
         return d
 
     def verify_and_catch(self, verifier, params):
@@ -182,10 +430,34 @@ class VerifierBase:
         # TODO: compare errors of both results
         pass
 
+    def killed_execution_handler(self, _res0, _res1):
+        if (_res0 is None) != (_res1 is None):
+            raise VerifierException(f"Timeout discrepancy: {_res0} | {_res1}")
+
     def compilation_error_handler(self, _res0, _res1):
         if _res0 != _res1:
             raise VerifierException(f"Compilation error discrepancy: {_res0} | {_res1}")
 
+    def init_settings(self):
+        settings = self.conf.verifier
+        self.workers = settings.get("workers", self.DEFAULT_WORKERS)
+        self.batch_size = settings.get("batch_size", self.DEFAULT_BATCH_SIZE)
+        self.lease_timeout = settings.get("lease_timeout", self.DEFAULT_LEASE_TIMEOUT)
+        # stop comparing two results at the first discrepancy
+        self.short_circuit = settings.get("short_circuit", False)
+        self.clustering = settings.get("clustering", True)
+        self.cluster_exemplars = settings.get("cluster_exemplars", self.DEFAULT_CLUSTER_EXEMPLARS)
+        self.retention_mode = retention_mode(self.conf)
+        self.clean_after = clean_after(self.conf)
+        self._verifiers = [(name, field, getattr(self, method)) for name, field, method in self.VERIFIERS]
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def init_pool(self):
+        if self.workers <= 1:
+            return None
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(type(self), self.config_file))
+
     def init_logger(self):
         logger_level = getattr(logging, self.conf.verbosity)
         self.logger = logging.getLogger("verifier")
@@ -198,3 +470,11 @@ class VerifierBase:
         db_client = get_mongo_client(self.conf.db["host"], self.conf.db["port"])
         self.results_collection = db_client["run_results"]
         self.verification_results_collection = db_client["verification_results"]
+        self.clusters_collection = db_client["discrepancy_clusters"]
+        self.compilation_log = db_client["compilation_log"]
+
+    def init_indexes(self):
+        self.results_collection.create_index([("is_handled", 1), ("claimed_at", 1)])
+        self.clusters_collection.create_index([("count", -1)])
+        if self.retention_mode == RETENTION_EXPIRE:
+            init_ttl_indexes(self.results_collection, self.verification_results_collection, self.compilation_log)
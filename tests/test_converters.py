@@ -4,8 +4,11 @@ import pytest
 from google.protobuf.json_format import Parse
 
 import fuzz.helpers.proto_loader as proto
+from fuzz.converters.dialects import DialectConverter
 from fuzz.converters.typed_converters import TypedConverter
-from fuzz.types_d import Address, BytesM, String
+from fuzz.converters.typed_converters_4 import NaginiConverter
+from fuzz.types_d import Address, BytesM, Int, String
+from fuzz.types_d.folding import opaque
 
 
 def convert_message(message: str) -> TypedConverter:
@@ -483,3 +486,102 @@ def test_proto_converter(case_name):
     conv.visit()
     print(conv.result)
     assert conv.result == expected
+
+
+@pytest.mark.parametrize("case_name", full_cases)
+def test_dialect_converter(case_name):
+    current_dir = os.path.dirname(__file__)
+    with open(f"{current_dir}/cases/{case_name}/in.json", "r") as inp_json:
+        mes = Parse(inp_json.read(), proto.Contract())
+
+    import random
+    results = []
+    for converter in (DialectConverter, TypedConverter, NaginiConverter):
+        random.seed(1337)
+        conv = converter(mes)
+        conv.visit()
+        results.append(conv)
+    dialect_conv, typed_conv, nagini_conv = results
+
+    assert dialect_conv.render("0.3.10") == typed_conv.result
+    assert dialect_conv.render("0.4.0") == nagini_conv.result
+    assert dialect_conv.function_inputs == typed_conv.function_inputs
+
+
+def test_dialect_render():
+    current_dir = os.path.dirname(__file__)
+    with open(f"{current_dir}/cases/invalid_operations/in.json", "r") as inp_json:
+        mes = Parse(inp_json.read(), proto.Contract())
+    conv = DialectConverter(mes)
+    conv.visit()
+
+    assert "\x00" not in conv.render("0.3.10")
+    assert "x_INT_0: uint8 = 2 / 1" in conv.render("0.3.10")
+    # the zero divisor is replaced for the floor division as well
+    assert "x_INT_0: uint8 = 2 // 1" in conv.render("0.4.0")
+
+
+def bounded(text, bounds):
+    folded = opaque(text)
+    folded.bounds = bounds
+    return folded
+
+
+def test_range_analysis_steering():
+    uint8 = Int(8)
+    conv = TypedConverter(proto.Contract())
+    left, right = bounded("x_INT_0", (200, 255)), bounded("x_INT_1", (100, 200))
+    assert conv._check_binop_range(uint8, left, "+", right)[0] == "-"
+    op, right_operand, bounds = conv._check_binop_range(uint8, left, "%", bounded("x_INT_1", (0, 0)))
+    assert (op, right_operand.text, bounds) == ("/", "1", (200, 255))
+    assert conv._check_binop_range(uint8, left, "-", right)[::2] == ("-", (0, 155))
+    assert conv.range_stats == {"provable_reverts": 2, "steered": 2}
+
+    conv.range_analysis = False
+    assert conv._check_binop_range(uint8, left, "+", right)[::2] == ("+", None)
+    assert conv.range_stats == {"provable_reverts": 3, "steered": 2}
+
+
+def test_variable_bounds():
+    conv = TypedConverter(proto.Contract())
+    conv._block_level_count = 1
+    conv._var_bounds["x_INT_0"] = ((200, 200), 1, 0)
+    assert conv._variable_bounds("x_INT_0") == (200, 200)
+    # an assignment in a nested block joins the bounds of both paths
+    conv._block_level_count = 2
+    conv._assign_bounds("x_INT_0", (5, 5))
+    assert conv._variable_bounds("x_INT_0") == (5, 200)
+    conv._block_level_count = 1
+    conv._assign_bounds("x_INT_0", (7, 7))
+    assert conv._variable_bounds("x_INT_0") == (7, 7)
+    # a loop may read the value assigned by its previous iteration
+    conv._for_block_count = 1
+    assert conv._variable_bounds("x_INT_0") is None
+    conv._assign_bounds("x_INT_0", (7, 7))
+    conv._for_block_count = 0
+    assert conv._variable_bounds("x_INT_0") is None
+    # the storage variables aren't tracked
+    conv._assign_bounds("self.x_INT_1", (1, 1))
+    assert conv._variable_bounds("self.x_INT_1") is None
+
+
+def test_variable_bounds_steering():
+    json_message = """
+{
+  "functions": [{
+    "block": {
+      "statements": [
+        {"decl": {"i": {"n": 7}, "expr": {"intExp": {"lit": {"intval": "200"}}}}},
+        {"decl": {"i": {"n": 7}, "expr": {"intExp": {"binOp": {
+          "op": "ADD",
+          "left": {"varRef": {"i": {"n": 7}}},
+          "right": {"lit": {"intval": "100"}}
+        }}}}}
+      ]
+    }
+  }]
+}
+    """
+    conv = convert_message(json_message)
+    assert "x_INT_1: uint8 = x_INT_0 - 100" in conv.result
+    assert conv.range_stats == {"provable_reverts": 1, "steered": 1}
@@ -0,0 +1,247 @@
+import io
+import json
+import os
+import random
+
+import pytest
+
+from fuzz.converters.dialects import DialectConverter
+from fuzz.converters.typed_converters import TypedConverter
+from fuzz.generators import run_inprocess
+from fuzz.generators.run_api import GeneratorBase
+from fuzz.generators.parallel import ParallelSupervisor
+from fuzz.generators.run_inprocess import InProcessGenerator, parse_message
+from fuzz.helpers.compiler_servers import CompilerServerError
+from fuzz.helpers.json_encoders import ExtendedDecoder
+
+current_dir = os.path.dirname(__file__)
+
+valid_source = """
+@external
+def f(a: uint256) -> uint256:
+    return a
+"""
+
+invalid_source = """
+x: uint8
+
+@external
+def f():
+    self.x = -1
+"""
+
+
+class CollectionMock:
+    def __init__(self):
+        self.documents = []
+
+    def insert_one(self, document):
+        self.documents.append(document)
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+
+class QueueMock:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, **message):
+        self.messages.append(message)
+
+
+class GeneratorMock(GeneratorBase):
+    def compile_source(self, proto_result):
+        import vyper
+        try:
+            return vyper.compile_code(proto_result), None
+        except Exception as e:
+            return None, e
+
+    def init_db(self):
+        self.compilation_log = CollectionMock()
+        self.run_results = CollectionMock()
+
+    def init_queue(self):
+        self.qm = QueueMock()
+
+
+@pytest.fixture
+def generator():
+    return GeneratorMock(TypedConverter, "./config_verifier_test.yml")
+
+
+@pytest.mark.parametrize("mode", [GeneratorBase.COMPILE_CHECK, GeneratorBase.COMPILE_FULL])
+def test_compile_modes(generator, mode):
+    generator.compile_mode = mode
+    result, error = generator.compile(valid_source)
+    assert error is None
+    assert (result is not None) == (mode == GeneratorBase.COMPILE_FULL)
+
+    _, error = generator.compile(invalid_source)
+    assert type(error).__name__ == "InvalidType"
+
+
+def test_compile_none(generator):
+    generator.compile_mode = GeneratorBase.COMPILE_NONE
+    assert generator.compile(invalid_source) == (None, None)
+
+
+def test_invalid_source_dropped(generator):
+    generator.compile_mode = GeneratorBase.COMPILE_CHECK
+    generator.compile = lambda source: (None, ValueError("invalid 0x01\n  line 1"))
+    with open(f"{current_dir}/cases/assignment/in.json", "rb") as f:
+        msg = parse_message(f.read())
+    generator.TestOneProtoInput(msg)
+    generator.compile = lambda source: (None, ValueError("invalid 0x02\n  line 2"))
+    generator.TestOneProtoInput(msg)
+
+    first, second = generator.compilation_log.documents
+    assert first["compiled"] is False
+    assert first["error_type"] == "ValueError"
+    # the failure class is new
+    assert first["published"] is True
+    assert second["published"] is False
+    assert len(generator.qm.messages) == 1
+    assert len(generator.run_results.documents) == 1
+
+
+@pytest.mark.parametrize("rate, published", [(0.0, False), (1.0, True)])
+def test_failure_publish_rate(generator, rate, published):
+    generator.publish_new_failures = False
+    generator.failure_publish_rate = rate
+    assert generator.should_publish(ValueError("invalid")) is published
+    assert generator.should_publish(None) is True
+
+
+def test_shared_failure_classes(generator):
+    generator.failure_publish_rate = 0.0
+    supervisor = ParallelSupervisor(generator, 2)
+    supervisor.init_failure_classes()
+    generator.shared_failure_classes = supervisor.failure_classes
+    generator.worker_index = 0
+    assert generator.should_publish(ValueError("invalid")) is True
+
+    # another worker doesn't publish the class again
+    generator.failure_classes = set()
+    generator.worker_index = 1
+    assert generator.should_publish(ValueError("invalid")) is False
+    assert generator.should_publish(ValueError("other")) is True
+    supervisor.manager.shutdown()
+
+
+def test_valid_source_published(generator):
+    generator.compile = lambda source: (None, None)
+    with open(f"{current_dir}/cases/assignment/in.json", "rb") as f:
+        generator.TestOneProtoInput(parse_message(f.read()))
+
+    assert generator.compilation_log.documents[0]["compiled"] is True
+    assert len(generator.qm.messages) == 1
+    assert len(generator.run_results.documents) == 1
+
+
+def test_raw_calldata(generator):
+    generator.compile = lambda source: (None, None)
+    with open(f"{current_dir}/cases/assignment/in.json", "rb") as f:
+        generator.TestOneProtoInput(parse_message(f.read()))
+
+    message = generator.qm.messages[0]
+    input_values = json.loads(message["function_input_values"], cls=ExtendedDecoder)
+    calldata = json.loads(message["function_calldata"])
+    assert len(calldata) != 0
+    for name, entry in calldata.items():
+        assert len(entry["calldata"]) == len(input_values[name])
+        assert all(c is None or c.startswith("0x") for c in entry["calldata"])
+
+    generator.raw_calldata = False
+    assert generator.generate_calldata(None, input_values) is None
+
+
+def test_generate_sequences(generator):
+    generator.call_sequences = 6
+    generator.sequence_length = 3
+    sequences = json.loads(generator.generate_sequences({"func_0": [], "func_1": []}))
+
+    assert len(sequences) == 6
+    for sequence in sequences:
+        assert len(sequence) == 3
+        assert all(fn in ("func_0", "func_1") and 0 <= i < len(generator.conf.input_strategies)
+                   for fn, i in sequence)
+
+    generator.call_sequences = 0
+    assert generator.generate_sequences({"func_0": []}) is None
+
+
+def test_parallel_persistence(generator):
+    generator.compile = lambda source: (None, None)
+    supervisor = ParallelSupervisor(generator, 2)
+    supervisor.batch_size = 2
+    supervisor.flush_interval = 0.01
+    # a worker hands the records over to the persistence process
+    generator.persistence = supervisor.persistence
+    generator.worker_index = 0
+    with open(f"{current_dir}/cases/assignment/in.json", "rb") as f:
+        msg = parse_message(f.read())
+    generator.TestOneProtoInput(msg)
+    generator.TestOneProtoInput(msg)
+    generator.report_stats(generator.stats_started + 10)
+    assert generator.compilation_log.documents == []
+
+    # the items reach the queue through its feeder thread
+    for _ in range(100):
+        supervisor.step()
+        if len(generator.compilation_log.documents) == 2 and supervisor.stats:
+            break
+    records = generator.compilation_log.documents
+    assert len(records) == 2
+    assert [m["_id"] for m in generator.qm.messages] == [str(r["_id"]) for r in records]
+    assert [r["generation_id"] for r in generator.run_results.documents] == [str(r["_id"]) for r in records]
+    assert supervisor.stats == {0: (0, 10)}
+
+
+def test_inprocess_single_conversion(monkeypatch):
+    monkeypatch.setattr(run_inprocess, "CompilerServerPool", lambda compilers, config_file: None)
+    generator = InProcessGenerator("./config_verifier_test.yml")
+    generator.compilers = [{"name": "adder"}, {"name": "nagini", "converter": "nagini"}]
+    with open(f"{current_dir}/cases/assignment/in.json", "rb") as f:
+        msg = parse_message(f.read())
+
+    random.seed(1)
+    message = generator.prepare_message(msg)
+    random.seed(1)
+    converter = DialectConverter(msg)
+    converter.visit()
+    # the sources of both dialects come from the same conversion
+    assert message["generation_result_adder"] == converter.render("0.3.10")
+    assert message["generation_result_nagini"] == converter.render("0.4.0")
+    assert "function_calldata" not in message
+
+
+def test_inprocess_server_error(monkeypatch):
+    monkeypatch.setattr(run_inprocess, "CompilerServerPool", lambda compilers, config_file: None)
+    generator = InProcessGenerator("./config_verifier_test.yml")
+    responses = [CompilerServerError("Compiler server adder: failed"), {"result_adder": []}]
+
+    class ServersMock:
+        closed = False
+
+        def run(self, message):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        def close(self):
+            self.closed = True
+
+    generator.servers = ServersMock()
+    generator.verifier.verify_result = lambda run_result: (None, None)
+    records = io.StringIO()
+    generator.run(f"{current_dir}/cases/assignment/in.json", records)
+    generator.run(f"{current_dir}/cases/assignment/in.json", records)
+
+    failed, executed = [json.loads(line) for line in records.getvalue().splitlines()]
+    assert failed["error_type"] == "CompilerServerError"
+    assert failed["error_message"] == "Compiler server adder: failed"
+    assert "results" in executed
+    assert generator.servers.closed
@@ -0,0 +1,522 @@
+import hashlib
+import io
+import json
+import os
+import time
+
+import boa
+import pytest
+from pymongo.errors import DuplicateKeyError
+from vyper.compiler.phases import CompilerData
+
+from fuzz.helpers.calldata import encode_calldata
+from fuzz.helpers.compiler_servers import CompilerServer, CompilerServerError, CompilerServerPool
+from fuzz.helpers.coverage_map import CoverageMap
+from fuzz.helpers.framing import read_frame, write_frame
+from fuzz.runners.compiler_coverage import CompilerCoverage
+from fuzz.runners.evm_coverage import evm_coverage
+from fuzz.runners.execution_cache import ExecutionCache
+from fuzz.runners.lifecycle import Lifecycle, resident_memory
+from fuzz.runners.runner_api import RunnerBase
+from fuzz.runners.runner_server import RunnerServer
+from fuzz.types_d import Int
+from fuzz.runners.storage_layout import storage_words, storage_plan, read_storage, node_words
+from fuzz.tools.coverage_report import merge_coverage
+
+source = """
+x: uint256
+y: uint8[100]
+z: DynArray[uint256, 5]
+b: Bytes[70]
+s: String[10]
+
+@external
+@nonreentrant("lock")
+def f(a: uint256) -> uint256:
+    self.x = a
+    return a
+"""
+
+
+class RunnerMock(RunnerBase):
+    def init_queue(self):
+        return None
+
+
+class ContractMock:
+    address = "0x" + "11" * 20
+
+
+class ComputationMock:
+    def __init__(self, storage):
+        self.storage = storage
+        self.state = self
+
+    def get_storage(self, address, slot):
+        return self.storage.get(slot, 0)
+
+    def memory_read_bytes(self, start, size):
+        return b"\x01" * size
+
+    def get_gas_used(self):
+        return 21000
+
+
+@pytest.fixture
+def runner():
+    os.environ["SERVICE_NAME"] = "opt_gas"
+    return RunnerMock("./config_verifier_test.yml")
+
+
+@pytest.mark.parametrize("vyper_type, words", [
+    ("uint256", 1),
+    ("nonreentrant lock", 1),
+    ("uint8[100]", 100),
+    ("uint256[2][3]", 6),
+    ("DynArray[uint256, 5]", 6),
+    ("DynArray[uint256[2],3]", 7),
+    ("Bytes[70]", 4),
+    ("String[32]", 2),
+    ("HashMap[address, uint256]", 1),
+])
+def test_storage_words(vyper_type, words):
+    assert storage_words(vyper_type) == words
+
+
+def test_storage_plan():
+    plan = storage_plan(CompilerData(source))
+    assert [slot for slot, _ in plan] == [0, 1, 2, 102, 108, 112]
+    assert sum(node_words(node) for _, node in plan) == 114
+
+
+def test_read_storage():
+    plan = storage_plan(CompilerData(source))
+    storage = {
+        1: 7,
+        # y[99]
+        101: 1,
+        # z: length 2 and the data; the stale slot after the length is ignored
+        102: 2, 103: 10, 104: 11, 105: 12,
+        # b: 33 bytes long
+        108: 33, 109: 0xff, 110: 0xee, 111: 0xdd,
+    }
+    read_slots = []
+
+    def read(slot):
+        read_slots.append(slot)
+        return storage.get(slot, 0)
+
+    state = read_storage(plan, read)
+    assert state == {
+        "1": "0x7", "101": "0x1",
+        "102": "0x2", "103": "0xa", "104": "0xb",
+        "108": "0x21", "109": "0xff", "110": "0xee",
+    }
+    # lock, x, y, z with 2 items, b with 2 words, s without data
+    assert len(read_slots) == 1 + 1 + 100 + 3 + 3 + 1
+
+
+@pytest.mark.parametrize("profile, state_size, memory", [
+    (RunnerBase.CAPTURE_MINIMAL, 0, None),
+    (RunnerBase.CAPTURE_STORAGE, 1,
+     hashlib.blake2b(b"\x01" * RunnerBase.MEMORY_DUMP_SIZE, digest_size=16).hexdigest()),
+    (RunnerBase.CAPTURE_FULL, 1, "01" * RunnerBase.MEMORY_DUMP_SIZE),
+])
+def test_compose_result_profiles(runner, profile, state_size, memory):
+    runner.capture_profile = profile
+    runner.storage_plan = storage_plan(CompilerData(source))
+    result = runner.compose_result(ContractMock(), ComputationMock({1: 5}), 7)
+
+    assert result["state"] == ({"1": "0x5"} if state_size else {})
+    assert result["memory"] == memory
+    assert result["consumed_gas"] == 21000
+    assert result["return_value"] == "7"
+
+
+def test_compile_cache(runner):
+    runner.compile_cache_size = 1
+    deployer = runner.compile(source)
+    assert runner.compile(source) is deployer
+
+    runner.compile(source + "\n")
+    assert len(runner.compile_cache) == 1
+    assert runner.compile(source) is not deployer
+
+
+def test_framing():
+    stream = io.BytesIO()
+    write_frame(stream, {"op": "ping"})
+    write_frame(stream, {"result": [1, "a"]})
+    stream.seek(0)
+
+    assert read_frame(stream) == {"op": "ping"}
+    assert read_frame(stream) == {"result": [1, "a"]}
+    assert read_frame(stream) is None
+
+
+def server_mock(name, responses):
+    server = CompilerServer.__new__(CompilerServer)
+    server.name = name
+    server.process = None
+    server.reader = io.BytesIO()
+    for response in responses:
+        write_frame(server.reader, response)
+    server.reader.seek(0)
+    server.writer = io.BytesIO()
+    return server
+
+
+def test_compiler_server_pool_error():
+    pool = CompilerServerPool.__new__(CompilerServerPool)
+    pool.servers = [server_mock("a", [{"error": "failed"}, {"result": 3}]),
+                    server_mock("b", [{"result": 1}, {"result": 2}])]
+    with pytest.raises(CompilerServerError, match="Compiler server a: failed"):
+        pool.run({})
+    # the response of the other server to the failed message isn't taken for the next one
+    assert pool.run({}) == {"result_a": 3, "result_b": 2}
+
+
+def test_runner_server_requests():
+    os.environ["SERVICE_NAME"] = "opt_gas"
+    server = RunnerServer("./config_verifier_test.yml")
+    requests = io.BytesIO()
+    write_frame(requests, {"op": "ping"})
+    write_frame(requests, {"op": "unknown"})
+    requests.seek(0)
+
+    responses = io.BytesIO()
+    server.serve(requests, responses)
+    responses.seek(0)
+
+    assert read_frame(responses) == {}
+    assert "error" in read_frame(responses)
+
+
+def test_coverage_map():
+    first = CoverageMap(64)
+    first.add_index(3)
+    first.add_index(67)
+    second = CoverageMap(64)
+    second.add_index(3)
+    second.add_index(5)
+
+    assert first.count() == 1
+    assert first.update(second) == 1
+    assert first.update(second) == 0
+    assert second.update(first) == 0
+    assert first.count() == 2
+    assert CoverageMap.fromhex(first.hex()).bits == first.bits
+
+
+def test_compiler_coverage(runner):
+    runner.compile_cache_size = 0
+    runner.campaign_coverage = {RunnerBase.COVERAGE_COMPILER: CoverageMap()}
+    runner.compiler_coverage = CompilerCoverage()
+
+    runner.new_coverage = {}
+    runner.compile(source)
+    new_bits = runner.new_coverage[RunnerBase.COVERAGE_COMPILER]
+    assert new_bits > 0
+
+    runner.new_coverage = {}
+    runner.compile(source)
+    assert runner.new_coverage == {}
+
+    with pytest.raises(Exception):
+        runner.compile(source + "\nx: uint256\n")
+    runner.compile(source)
+    assert runner.new_coverage == {}
+
+
+def test_evm_coverage(runner):
+    contract = boa.loads(source)
+    contract.f(1)
+    coverage_map = evm_coverage(contract._computation)
+    assert coverage_map.count() > 0
+    assert CoverageMap.from_compact(coverage_map.compact()).bits == coverage_map.bits
+
+    runner.campaign_coverage = {RunnerBase.COVERAGE_EVM: CoverageMap()}
+    runner.input_strategy = 1
+    runner.storage_plan = storage_plan(contract.compiler_data)
+    result = runner.compose_result(contract, contract._computation, 1)
+    assert result["coverage"] == coverage_map.compact()
+    assert runner.strategy_coverage == {1: {"calls": 1, "new_bits": coverage_map.count()}}
+
+    run_results = [{"result_opt_gas": [{"f": [result, {"runtime_error": "error"}]}, {"deploy_error": "error"}]}]
+    assert merge_coverage(run_results, ["opt_gas"])["opt_gas"].bits == coverage_map.bits
+
+
+class BytecodeIndexMock:
+    def __init__(self):
+        self.documents = {}
+
+    def insert_one(self, document):
+        if document["_id"] in self.documents:
+            raise DuplicateKeyError("duplicate key")
+        self.documents[document["_id"]] = document
+
+    def find_one(self, query):
+        return self.documents[query["_id"]]
+
+
+def test_skip_identical_bytecode(runner):
+    message = {
+        "_id": "66b178d8b7f5f3dfa365a9e0",
+        "generation_result": source,
+        "function_input_values": json.dumps({"f": [[1], [2]]}),
+    }
+    runner.bytecode_index = BytecodeIndexMock()
+    results = runner.handle_compilation(message)
+    assert isinstance(results, list)
+
+    runner.compiler_key = "opt_codesize"
+    assert runner.handle_compilation(message) == {RunnerBase.IDENTICAL_TO: "opt_gas"}
+    assert runner.execution_stats["executed"] == 1
+    assert runner.execution_stats["skipped"] == 1
+
+    # a redelivered message is executed again by the runner which claimed it
+    runner.compiler_key = "opt_gas"
+    assert isinstance(runner.handle_compilation(message), list)
+
+
+class ExecutionCacheCollectionMock:
+    def __init__(self):
+        self.documents = {}
+
+    def find_one(self, query, projection=None):
+        return self.documents.get(query["_id"])
+
+    def update_one(self, query, update, upsert=False):
+        self.documents.setdefault(query["_id"], {"_id": query["_id"], **update["$setOnInsert"]})
+
+
+def test_execution_cache():
+    collection = ExecutionCacheCollectionMock()
+    cache = ExecutionCache(2, collection)
+    cache.put("a", {"gas": 1})
+    cache.put("b", {"gas": 2})
+    assert cache.get("a") == {"gas": 1}
+    cache.put("c", {"gas": 3})
+    # the least recently used entry is evicted, the shared tier keeps it
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b") == {"gas": 2}
+    assert cache.get("d") is None
+    assert cache.stats == {"hits": 1, "shared_hits": 1, "misses": 1}
+
+
+memoized_source = """
+x: public(uint256)
+
+@external
+def set_x(a: uint256):
+    self.x = a
+
+@external
+@pure
+def double(a: uint256) -> uint256:
+    return a * 2
+"""
+
+
+def test_memoized_execution_result(runner):
+    runner.bytecode_hash = "hash"
+    def execution_result(contract, fn, values):
+        getattr(contract, fn)(*values)
+        return {"fn": fn, "values": values, "x": contract.x()}
+
+    runner.execution_result = execution_result
+
+    # the runner reverts the state after a contract, so the next deployment is at the same address
+    with boa.env.anchor():
+        contract = runner.compile(memoized_source).deploy()
+        call_state = runner.init_call_state(contract, [])
+        first = runner.memoized_execution_result(call_state, contract, "set_x", [1])
+        assert runner.memoized_execution_result(call_state, contract, "x", []) == {"fn": "x", "values": [], "x": 1}
+
+    # the same calls to a new deployment are taken from the cache, the state changing call isn't executed
+    contract = runner.compile(memoized_source).deploy()
+    call_state = runner.init_call_state(contract, [])
+    assert runner.memoized_execution_result(call_state, contract, "set_x", [1]) is first
+    assert runner.memoized_execution_result(call_state, contract, "x", [])["x"] == 1
+    assert call_state["pending"] == [("set_x", [1], None)]
+    assert contract.x() == 0
+
+    # a miss replays the skipped calls first
+    assert runner.memoized_execution_result(call_state, contract, "set_x", [2])["x"] == 2
+    assert call_state["pending"] == []
+    assert runner.execution_cache.stats == {"hits": 2, "shared_hits": 0, "misses": 3}
+
+    # pure functions don't depend on the calls made before
+    runner.memoized_execution_result(call_state, contract, "double", [3])
+    call_state = runner.init_call_state(contract, [])
+    runner.memoized_execution_result(call_state, contract, "double", [3])
+    assert runner.execution_cache.stats["hits"] == 3
+
+    # the results of a deployment at another address aren't shared
+    other = runner.compile(memoized_source).deploy()
+    assert runner.memoized_execution_result(runner.init_call_state(other, []), other, "double", [3]) is not None
+    assert runner.execution_cache.stats["misses"] == 5
+
+
+def test_raw_calldata(runner):
+    message = {
+        "_id": "66b178d8b7f5f3dfa365a9e1",
+        "generation_result": memoized_source,
+        "function_input_values": json.dumps({"set_x": [[7], [8]], "double": [[3], [4]], "x": [[], []]}),
+        "function_calldata": json.dumps({
+            "set_x": {"calldata": [encode_calldata("set_x", [Int(256)], [7]), None]},
+            "double": {"calldata": [encode_calldata("double", [Int(256)], [3]), None]},
+            # the selector of a missing function reverts
+            "x": {"calldata": ["0x00000000", None]},
+        }),
+        "call_sequences": json.dumps([[["set_x", 0], ["double", 0]]]),
+    }
+    runner.bytecode_index = None
+    calls, runtime_errors = runner.execution_stats["calls"], runner.execution_stats["runtime_errors"]
+    [results] = runner.handle_compilation(message)
+
+    raw, _ = results["double"]
+    # the raw return data
+    assert json.loads(raw["return_value"]) == "0x" + (6).to_bytes(32, "big").hex()
+    assert "runtime_error" in results["x"][0]
+    assert runner.execution_stats["calls"] - calls == 6
+    assert runner.execution_stats["runtime_errors"] - runtime_errors == sum(
+        "runtime_error" in r for fn in ("set_x", "double", "x") for r in results[fn])
+    # the pre-encoded calldata changes the state
+    assert list(results["set_x"][0]["state"].values()) == ["0x7"]
+    assert [r["return_value"] for r in results["sequence_0"]] == [results["set_x"][0]["return_value"],
+                                                                  raw["return_value"]]
+
+
+def test_execute_sequences(runner):
+    calls = []
+
+    def execution_result(contract, fn, values):
+        calls.append(fn)
+        getattr(contract, fn)(*values)
+        return {"fn": fn, "x": contract.x()}
+
+    runner.execution_result = execution_result
+    contract = runner.compile(memoized_source).deploy()
+    input_values = {"set_x": [[7], [8]], "x": [[], []]}
+    sequences = [
+        [["set_x", 0], ["x", 0]],
+        [["set_x", 0], ["set_x", 1], ["x", 1]],
+        [["x", 0]],
+    ]
+    with boa.env.anchor():
+        results = runner.execute_sequences(contract, sequences, input_values)
+
+    assert list(results) == ["sequence_0", "sequence_1", "sequence_2"]
+    assert [r["x"] for r in results["sequence_0"]] == [7, 7]
+    assert [r["x"] for r in results["sequence_1"]] == [7, 8, 8]
+    # the state is restored for the sibling sequences
+    assert [r["x"] for r in results["sequence_2"]] == [0]
+    # the shared prefix is executed once
+    assert len(calls) == 5
+    assert contract.x() == 0
+
+
+def test_supervised_compilation(runner):
+    message = {"_id": "66b178d8b7f5f3dfa365a9e2", "function_input_values": json.dumps({"__init__": [[1], [2]]})}
+    dead_letters = []
+    runner.publish_dead_letter = dead_letters.append
+    runner.contract_timeout = 1
+    # the stubs are inherited by the forked worker
+    runner.handle_compilation = lambda data: [{"f": []}]
+    runner.init_db = lambda: None
+
+    assert runner.supervised_compilation(message) == [{"f": []}]
+    worker = runner.worker
+    assert worker.process.is_alive()
+
+    runner.worker.kill()
+    runner.worker = None
+    runner.handle_compilation = lambda data: time.sleep(10)
+    # retried first
+    assert runner.supervised_compilation(message) is None
+    assert runner.worker is None
+    # the failed attempts are counted by the header of the requeued message
+    assert runner.supervised_compilation(message, 1) == [{RunnerBase.TIMEOUT_ERROR: "Execution exceeded 1 s"}] * 2
+    assert dead_letters == [message]
+    assert not worker.process.is_alive()
+
+    runner.max_attempts = 1
+    runner.handle_compilation = lambda data: os._exit(3)
+    [result, _] = runner.supervised_compilation(message)
+    assert result == {RunnerBase.WORKER_ERROR: "Worker exited with code 3"}
+
+
+class ChannelMock:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, body, properties.headers))
+
+
+def test_requeue(runner):
+    runner.channel = ChannelMock()
+    runner.queue_name = "queue3.10"
+    runner.requeue(b"{}", 1)
+    assert runner.channel.published == [("queue3.10", b"{}", {RunnerBase.ATTEMPTS_HEADER: 1})]
+
+
+def test_worker_coverage_merged(runner):
+    runner.campaign_coverage = {RunnerBase.COVERAGE_EVM: CoverageMap(64)}
+    runner.contract_timeout = 5
+    runner.init_db = lambda: None
+
+    def handle_compilation(data):
+        runner.new_coverage = {}
+        coverage_map = CoverageMap(64)
+        coverage_map.add_index(5)
+        runner.add_coverage(RunnerBase.COVERAGE_EVM, coverage_map)
+        return []
+
+    runner.handle_compilation = handle_compilation
+    runner.supervised_compilation({"_id": "66b178d8b7f5f3dfa365a9e2"})
+    runner.worker.kill()
+    runner.worker = None
+    # the bits found by the recycled worker aren't new for the next one
+    assert runner.campaign_coverage[RunnerBase.COVERAGE_EVM].indices() == [5]
+    runner.supervised_compilation({"_id": "66b178d8b7f5f3dfa365a9e2"})
+    assert runner.new_coverage == {}
+    runner.worker.kill()
+
+
+def test_lifecycle():
+    lifecycle = Lifecycle(max_rss_mb=100, latency_drift=2.0, baseline_contracts=2, smoothing=0.5)
+    lifecycle.record(0.1, 2 ** 20)
+    lifecycle.record(0.3, 2 ** 20)
+    assert lifecycle.baseline == pytest.approx(0.2)
+    assert lifecycle.restart_reason() is None
+
+    lifecycle.record(1.0, 2 ** 20)
+    assert lifecycle.latency == pytest.approx(0.6)
+    assert "latency" in lifecycle.restart_reason()
+
+    lifecycle.record(0.2, 200 * 2 ** 20)
+    assert "resident memory" in lifecycle.restart_reason()
+    assert resident_memory() > 0
+
+
+def test_execute_contract(runner):
+    deployed = []
+
+    def handle_compilation(data):
+        deployed.append(runner.compile(memoized_source).deploy())
+        deployed[-1].set_x(1)
+        return []
+
+    runner.handle_compilation = handle_compilation
+    runner.env_reset_interval = 2
+    env = boa.env
+    runner.execute_contract({})
+    runner.execute_contract({})
+    # the state is reverted after a contract, so the contracts are deployed at the same address
+    assert deployed[0].address == deployed[1].address
+    assert env.evm.vm.state.get_code(deployed[0].address.canonical_address) == b""
+    assert boa.env is not env
+    assert runner.lifecycle.contracts == 2
+    boa.set_env(env)
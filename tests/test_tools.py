@@ -0,0 +1,96 @@
+import os
+import random
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+
+from fuzz.generators.run_inprocess import parse_message
+from fuzz.tools import corpus_distill
+from fuzz.tools.corpus_distill import deduplicate, distill, extract_features
+from fuzz.tools.retention import compact_log, source_hash
+from fuzz.tools.reducer import Reducer, apply_edit, edit_sites
+
+current_dir = os.path.dirname(__file__)
+
+
+def test_deduplicate():
+    entries = [("a", 10, "h1", [1]), ("b", 5, "h1", [2]), ("c", 7, "h2", [])]
+    assert sorted(deduplicate(entries)) == [("b", 5, "h1", [2]), ("c", 7, "h2", [])]
+
+
+def test_distill():
+    entries = [
+        ("a", 10, "h1", [1, 2]),
+        ("b", 20, "h2", [1, 2, 3]),
+        ("c", 5, "h3", [3, 4]),
+        ("d", 1, "h4", [4]),
+        ("e", 1, "h5", []),
+    ]
+    kept = sorted(e[0] for e in distill(entries))
+    assert kept == ["b", "d", "e"]
+
+
+def test_extract_features():
+    path = f"{current_dir}/cases/assignment/in.json"
+
+    corpus_distill._init_worker(0)
+    _, size, source_hash, features = extract_features(path)
+    assert size == os.path.getsize(path)
+    assert features == []
+
+    corpus_distill._init_worker(1 << 16)
+    # the conversion doesn't depend on the state of the random generator
+    random.seed(1)
+    _, _, coverage_hash, features = extract_features(path)
+    assert coverage_hash == source_hash
+    assert len(features) > 0
+
+
+class EvaluatorMock:
+    """
+    Reproduces a storage discrepancy while the contract has an `if` statement
+    """
+
+    def prepare_message(self, msg):
+        return {"msg": msg}
+
+    def execute_message(self, message):
+        msg = message["msg"]
+        has_if = any(s.HasField("if_stmt") for f in msg.functions for s in f.block.statements)
+        results = {"Storage": "Storage discrepancy" if has_if else None}
+        return {"results": [{"compilers": ("result_a", "result_b"), "results": results}]}
+
+
+def test_reducer():
+    with open(f"{current_dir}/cases/elif_cases/in.json", "rb") as f:
+        msg = parse_message(f.read())
+    reducer = Reducer([EvaluatorMock(), EvaluatorMock()], (("result_a", "result_b"), "Storage"))
+    assert reducer.reproduces(msg)
+
+    reduced = reducer.reduce(msg)
+    reducer.pool.shutdown()
+    assert reduced.ByteSize() < msg.ByteSize()
+    assert len(reduced.functions) == 1
+    assert [s.WhichOneof("stmt_oneof") for s in reduced.functions[0].block.statements] == ["if_stmt"]
+    # no reduction of the result reproduces the discrepancy
+    for site in edit_sites(reduced):
+        assert not reducer.cache[apply_edit(reduced, site).SerializeToString(deterministic=True)]
+
+
+def test_compact_log():
+    log = {
+        "_id": ObjectId.from_datetime(datetime(2024, 1, 1, tzinfo=timezone.utc)),
+        "json_msg": "{}",
+        "generation_result": "source",
+        "compilation_result": "bytecode",
+        "error_type": None,
+        "generator_version": "0.1.3",
+        "compiled_opt_gas": True,
+        "function_input_values": "{}",
+    }
+    update = compact_log(log, datetime(2024, 1, 1, 0, 1))
+
+    assert sorted(update["$unset"]) == ["compilation_result", "function_input_values", "generation_result",
+                                        "json_msg"]
+    assert update["$set"]["latency"] == 60
+    assert update["$set"]["source_hash"] == source_hash({"generation_result": "source", "json_msg": "other"})
@@ -1,6 +1,8 @@
 import pytest
 
-from fuzz.types_d import BytesM, String, Int, TypeRangeError, Bytes, Bool, Decimal, Address
+from fuzz.converters.ranges import binop_bounds, conversion_bounds
+from fuzz.types_d import BytesM, String, Int, TypeRangeError, Bytes, Bool, Decimal, Address, FixedList, DynArray
+from fuzz.types_d.folding import binary, literal, negate, opaque, parenthesize
 
 data = [
     [i, f"bytes{i}"] for i in range(1, 33)
@@ -140,3 +142,95 @@ def test_string_type_hashable():
     i = String(100)
     d = {i: "data"}
     assert d[i] == "data"
+
+
+@pytest.mark.parametrize("vyper_type, abi_type", [
+    (Int(8, True), "int8"),
+    (Int(256), "uint256"),
+    (BytesM(4), "bytes4"),
+    (Bytes(100), "bytes"),
+    (String(10), "string"),
+    (Bool(), "bool"),
+    (Address(), "address"),
+    (Decimal(), "fixed168x10"),
+    (FixedList(3, Int(16)), "uint16[3]"),
+    (DynArray(5, FixedList(2, Bool())), "bool[2][]"),
+])
+def test_abi_type(vyper_type, abi_type):
+    assert vyper_type.abi_type == abi_type
+
+
+def fold(text):
+    # builds the expression the way the converter does: operands are literals or parenthesized
+    left, op, right = text.split(" ")
+    return binary(literal(left), op, literal(right))
+
+
+folded_expressions = ["-2 ** 2", "-2 ** -1", "2 ** -2", "-7 // 2", "-7 / 2", "7 % -3", "-1 << 3", "1.0 & 2.0",
+                      "5 // 0", "-5.0 % 3.0", "255 ^ -1"]
+
+
+@pytest.mark.parametrize("text", folded_expressions)
+def test_folding_semantics(text):
+    try:
+        expected = eval(text)
+    except Exception:
+        expected = None
+    folded = fold(text)
+    assert folded.text == text
+    assert folded.value == expected
+    assert parenthesize(folded).value == expected
+    if expected is not None:
+        assert negate(folded).value == eval(f"-{text}")
+
+
+def test_check_binop_bounds():
+    uint8 = Int(8)
+    left, op, right = uint8.check_binop_bounds(literal("7"), "//", literal("0"))
+    assert (left.text, op, right.text) == ("7", "//", "1")
+
+    left, op, right = uint8.check_binop_bounds(literal("7"), "<<", literal("300"))
+    assert op == "+"
+
+    left, op, right = Int(256).check_binop_bounds(literal("7"), "<<", literal("300"))
+    assert (op, right.text, right.value) == ("<<", "43", 43)
+
+    left, op, right = uint8.check_binop_bounds(literal("2"), "**", literal("-3"))
+    assert (right.text, right.value) == ("--3", 3)
+
+
+def test_check_literal_bounds():
+    uint8 = Int(8)
+    assert uint8.check_literal_bounds(uint8.fold_binop(literal("200"), "+", literal("100"))).text == "44"
+    assert uint8.check_literal_bounds(opaque("x_INT_0 + 300")).text == "x_INT_0 + 300"
+    # floats are only negated for the unsigned types
+    assert uint8.check_literal_bounds(fold("-7 / 2")).text == "--7 / 2"
+    assert uint8.check_literal_bounds(fold("-7 / 2")).value == 3.5
+    assert Int(8, True).check_literal_bounds(fold("-7 / 2")).text == "-7 / 2"
+
+
+def test_huge_power_folding():
+    int256 = Int(256, True)
+    # the residue of the value is kept, the value itself isn't computed
+    result = int256.check_literal_bounds(int256.fold_binop(literal("3"), "**", literal(str(2 ** 255))))
+    assert result.value == pow(3, 2 ** 255, 2 ** 256) - 2 ** 255
+    result = int256.check_literal_bounds(int256.fold_binop(literal("-3"), "**", literal(str(2 ** 255))))
+    assert result.value == -pow(3, 2 ** 255, 2 ** 256) % 2 ** 256 - 2 ** 255
+    result = int256.check_literal_bounds(int256.fold_binop(literal("3"), "<<", literal(str(2 ** 255))))
+    assert result.value == -2 ** 255
+
+
+def test_binop_bounds():
+    uint8, int8 = Int(8), Int(8, True)
+    assert binop_bounds((0, 10), "+", (5, 5), uint8) == (5, 15)
+    assert binop_bounds((200, 255), "+", (100, 200), uint8) is None
+    assert binop_bounds((0, 10), "-", (20, 30), uint8) is None
+    assert binop_bounds((-7, 7), "//", (2, 2), int8) == (-3, 3)
+    assert binop_bounds((0, 255), "%", (0, 0), uint8) is None
+    # the sign of the remainder follows the dividend
+    assert binop_bounds((-100, 5), "%", (-3, 10), int8) == (-9, 5)
+    assert binop_bounds((-128, -128), "/", (-1, -1), int8) is None
+    assert binop_bounds((2, 3), "**", (8, 8), uint8) is None
+    assert binop_bounds((0, 255), "<<", (0, 255), uint8) == (0, 255)
+    assert conversion_bounds((-5, 300), uint8) == (0, 255)
+    assert conversion_bounds((-5, -1), uint8) is None
@@ -3,6 +3,11 @@ import json
 # from fuzz.verifiers.verifier_api import VerifierBase
 
 from fuzz.verifiers.simple_verifier import VerifierBase
+from fuzz.verifiers.verifier_api import DUPLICATE_KEY_ERROR
+from pymongo.errors import BulkWriteError
+from fuzz.verifiers.clustering import contract_clusters, normalize_message
+from fuzz.helpers.retention import RETENTION_EXPIRE, EXPIRE_FIELD
+from fuzz.helpers.fingerprint import result_fingerprint
 
 data = """
     {
@@ -61,136 +66,6 @@ data = """
       }
     ]
   }"""
-expected = {
-    "func_0": [
-        [
-            [
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 48,
-                    "return_value": "null"
-                },
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 48,
-                    "return_value": "null"
-                }
-            ],
-            [
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 48,
-                    "return_value": "null"
-                },
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 48,
-                    "return_value": "null"
-                }
-            ]
-        ]
-    ],
-    "__default__": [
-        [
-            [
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 49,
-                    "return_value": "null"
-                },
-                {
-                    "state": [
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0",
-                        "0"
-                    ],
-                    "memory": "",
-                    "consumed_gas": 49,
-                    "return_value": "null"
-                }
-            ]
-        ]
-    ]
-}
-
-
-def test_reshape_data():
-    data_dict = json.loads(data)
-    # pytest mocks mongodb connection somehow...
-    verifier = VerifierBase("./config_verifier_test.yml")
-    reshaped = verifier.reshape_data(data_dict)
-
-    print(reshaped)
-    assert reshaped == expected
-
-
 def test_verify_two_result():
     res0 = {
         "state": ["0", "0", "0", "0", "0", "0", "0", "0", "0", "0"],
@@ -215,7 +90,26 @@ def test_verify_two_result():
     assert r == expected_res
 
 
-def test_verify_results():
+def test_verify_two_result_short_circuit():
+    res0 = {
+        "state": ["0", "0", "0", "0", "0", "0", "0", "0", "0", "0"],
+        "memory": "",
+        "consumed_gas": 48,
+        "return_value": "1"
+    }
+    res1 = {
+        "state": ["1", "0", "0", "0", "0", "0", "0", "0", "0", "0"],
+        "memory": "",
+        "consumed_gas": 48,
+        "return_value": "2"
+    }
+    verifier = VerifierBase("./config_verifier_test.yml")
+    verifier.short_circuit = True
+    r = verifier.verify_two_results(res0, res1)
+    assert r == {'Gas': None, 'Return_Value': 'Return Value discrepancy: 1 | 2'}
+
+
+def test_compare_results():
     from pprint import pprint
     data_dict = json.loads(data)
     expected_res = [{'compilers': ('result_opt_gas', 'result_opt_codesize'),
@@ -243,7 +137,205 @@ def test_verify_results():
                                  'Return_Value': None,
                                  'Storage': None}}]
     verifier = VerifierBase("./config_verifier_test.yml")
-    reshaped = verifier.reshape_data(data_dict)
-    r = verifier.verify_results(reshaped)
+    r = verifier.compare_results(data_dict)
     pprint(r)
     assert expected_res == r
+
+
+def test_verify_result():
+    data_dict = json.loads(data)
+    verifier = VerifierBase("./config_verifier_test.yml")
+    status, results = verifier.verify_result(data_dict)
+    assert status == VerifierBase.VERIFIED
+    assert len(results) == 3
+
+
+def test_verify_result_not_ready():
+    data_dict = json.loads(data)
+    del data_dict["result_opt_codesize"]
+    verifier = VerifierBase("./config_verifier_test.yml")
+    assert verifier.verify_result(data_dict) == (VerifierBase.NOT_READY, None)
+
+
+def test_verify_result_invalid():
+    data_dict = json.loads(data)
+    data_dict["result_opt_gas"] = [{}]
+    verifier = VerifierBase("./config_verifier_test.yml")
+    assert verifier.verify_result(data_dict) == (VerifierBase.INVALID, None)
+
+
+def test_compare_results_fingerprint():
+    data_dict = json.loads(data)
+    # the fingerprints are trusted, even though the states differ
+    data_dict["result_opt_gas"][0]["func_0"][0]["state"][0] = "1"
+    for compiler in ("result_opt_gas", "result_opt_codesize"):
+        data_dict[compiler][0]["func_0"][0]["fingerprint"] = "equal"
+    verifier = VerifierBase("./config_verifier_test.yml")
+    r = verifier.compare_results(data_dict)
+    assert r[0]["results"] == {'Gas': None, 'Memory': None, 'Return_Value': None, 'Storage': None}
+
+    # falls back to the detailed comparison on a mismatch
+    data_dict["result_opt_gas"][0]["func_0"][0]["fingerprint"] = "different"
+    r = verifier.compare_results(data_dict)
+    assert r[0]["results"]["Storage"] is not None
+
+
+def test_result_fingerprint():
+    res0 = {"state": ["0"] * 10, "memory": "", "consumed_gas": 48, "return_value": "null"}
+    res1 = dict(res0, memory="00", consumed_gas=49)
+    res2 = dict(res0, return_value="1")
+    assert result_fingerprint(res0) == result_fingerprint(res1)
+    assert result_fingerprint(res0) != result_fingerprint(res2)
+
+
+def test_discrepancy_kinds():
+    results = [
+        {"compilers": ("result_a", "result_b"), "deployment": 0, "results": None},
+        {"compilers": ("result_b", "result_c"), "deployment": 0, "results": "Compilation error discrepancy"},
+        {"compilers": ("result_a", "result_b"), "function": "func_0",
+         "results": {"Gas": None, "Storage": "Storage discrepancy"}},
+        {"compilers": ("result_a", "result_b"), "function": "func_1", "results": {}},
+    ]
+    assert VerifierBase.discrepancy_kinds(results) == {
+        (("result_b", "result_c"), VerifierBase.DEPLOYMENT),
+        (("result_a", "result_b"), "Storage"),
+    }
+
+
+def test_normalize_message():
+    storage0 = "Storage discrepancy: {'0': '0x01', '5': '0x02'} | {'0': '0x03'}"
+    storage1 = "Storage discrepancy: {'1': '0xff'} | {'1': '0x00', '2': '0x01'}"
+    assert normalize_message(storage0) == normalize_message(storage1)
+    assert normalize_message("Return Value discrepancy: [12, \"abc\"] | [-13, \"x\"]") == \
+        "Return Value discrepancy: [<num>...] | [<num>...]"
+    assert normalize_message(None) == ""
+
+
+def test_contract_clusters():
+    results = [
+        {"compilers": ("result_a", "result_b"), "function": "func_0",
+         "results": {"Gas": None, "Storage": "Storage discrepancy: {'0': '0x01'} | {'0': '0x02'}"}},
+        {"compilers": ("result_a", "result_b"), "function": "func_1",
+         "results": {"Gas": None, "Storage": "Storage discrepancy: {'3': '0x05'} | {'3': '0x07'}"}},
+        {"compilers": ("result_b", "result_c"), "function": "func_1",
+         "results": {"Gas": None, "Storage": "Storage discrepancy: {'3': '0x05'} | {'3': '0x07'}"}},
+    ]
+    clusters = contract_clusters(results)
+    assert sorted(clusters.values()) == [
+        (("result_a", "result_b"), "Storage", "Storage discrepancy: {<str>...} | {<str>...}"),
+        (("result_b", "result_c"), "Storage", "Storage discrepancy: {<str>...} | {<str>...}"),
+    ]
+
+
+class CollectionMock:
+    def __init__(self):
+        self.requests = []
+        self.ids = set()
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests.extend(requests)
+
+    def insert_many(self, documents, ordered=True):
+        self.requests.append(("insert_many", documents))
+        errors = [{"index": i, "code": DUPLICATE_KEY_ERROR} for i, d in enumerate(documents) if d["_id"] in self.ids]
+        self.ids.update(d["_id"] for d in documents)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    def update_many(self, query, update):
+        self.requests.append(("update_many", query, update))
+
+
+def test_update_clusters():
+    verifier = VerifierBase("./config_verifier_test.yml")
+    verifier.clusters_collection = CollectionMock()
+    verifier.cluster_exemplars = 1
+    results = [{"compilers": ("result_a", "result_b"), "deployment": 0, "results": "Compilation error: 0x01"}]
+    verifier.update_clusters([{"_id": i, "generation_id": str(i), "results": results} for i in range(3)])
+
+    assert len(verifier.clusters_collection.requests) == 1
+    update = verifier.clusters_collection.requests[0]._doc
+    assert update["$inc"] == {"count": 3}
+    assert update["$setOnInsert"]["kind"] == VerifierBase.DEPLOYMENT
+    assert update["$push"]["exemplars"]["$each"] == [{"verification_id": 0, "generation_id": "0"}]
+
+
+def test_handle_results_retention():
+    verifier = VerifierBase("./config_verifier_test.yml")
+    verifier.retention_mode = RETENTION_EXPIRE
+    verifier.clustering = False
+    for name in ("results_collection", "verification_results_collection", "compilation_log"):
+        setattr(verifier, name, CollectionMock())
+    clean = json.loads(data)
+    discrepancy = json.loads(data)
+    discrepancy["_id"] = "discrepancy"
+    discrepancy["generation_id"] = "66b178d8b7f5f3dfa365a9e2"
+    discrepancy["result_opt_gas"][0]["func_0"][0]["return_value"] = "[1]"
+    discrepancy["result_opt_gas"][0]["func_0"][0].pop("fingerprint", None)
+    invalid = json.loads(data)
+    invalid["_id"] = "invalid"
+    invalid["generation_id"] = "66b178d8b7f5f3dfa365a9e3"
+    invalid["result_opt_gas"] = [{}]
+    verifier.handle_results([clean, discrepancy, invalid])
+
+    (_, inserted), = verifier.verification_results_collection.requests
+    assert [EXPIRE_FIELD in entry for entry in inserted] == [True, False]
+    updates = {u[2]["$set"].get("has_discrepancy"): u for u in verifier.results_collection.requests}
+    assert updates[False][1]["_id"]["$in"] == [clean["_id"]]
+    assert EXPIRE_FIELD in updates[False][2]["$set"]
+    assert updates[True][1]["_id"]["$in"] == ["discrepancy"]
+    assert EXPIRE_FIELD not in updates[True][2]["$set"]
+    # the invalid result is handled, but neither clean nor expired
+    assert updates[None][1]["_id"]["$in"] == ["invalid"]
+    assert updates[None][2]["$set"]["invalid"] is True
+    assert EXPIRE_FIELD not in updates[None][2]["$set"]
+    (_, expired, _), = verifier.compilation_log.requests
+    assert [str(i) for i in expired["_id"]["$in"]] == [clean["generation_id"]]
+
+
+def test_resolve_identical():
+    data_dict = json.loads(data)
+    data_dict["result_opt_codesize"] = {VerifierBase.IDENTICAL_TO: "opt_gas"}
+    verifier = VerifierBase("./config_verifier_test.yml")
+    status, results = verifier.verify_result(data_dict)
+    assert status == VerifierBase.VERIFIED
+    assert not verifier.has_discrepancy(results)
+
+    del data_dict["result_opt_gas"]
+    assert verifier.verify_result(data_dict)[0] == VerifierBase.NOT_READY
+
+    data_dict["result_opt_gas"] = {VerifierBase.IDENTICAL_TO: "opt_codesize"}
+    assert verifier.verify_result(data_dict)[0] == VerifierBase.NOT_READY
+    data_dict["result_opt_gas"] = {VerifierBase.IDENTICAL_TO: "opt_gas"}
+    assert verifier.verify_result(data_dict) == (VerifierBase.INVALID, None)
+    data_dict["result_opt_gas"] = {VerifierBase.IDENTICAL_TO: "unknown"}
+    assert verifier.verify_result(data_dict) == (VerifierBase.INVALID, None)
+
+
+def test_killed_execution():
+    data_dict = json.loads(data)
+    data_dict["result_opt_codesize"] = [{VerifierBase.TIMEOUT_ERROR: "Execution exceeded 60 s"}]
+    verifier = VerifierBase("./config_verifier_test.yml")
+    # only one compiler has timed out
+    status, results = verifier.verify_result(data_dict)
+    assert status == VerifierBase.VERIFIED
+    assert verifier.discrepancy_kinds(results) == {(("result_opt_gas", "result_opt_codesize"), VerifierBase.TIMEOUT)}
+
+    data_dict["result_opt_gas"] = [{VerifierBase.WORKER_ERROR: "Worker has exited with code -9"}]
+    assert verifier.verify_result(data_dict) == (VerifierBase.INVALID, None)
+
+
+def test_handle_results_reclaimed():
+    verifier = VerifierBase("./config_verifier_test.yml")
+    for name in ("results_collection", "verification_results_collection", "compilation_log", "clusters_collection"):
+        setattr(verifier, name, CollectionMock())
+    discrepancy = json.loads(data)
+    discrepancy["result_opt_gas"][0]["func_0"][0]["return_value"] = "[1]"
+    discrepancy["result_opt_gas"][0]["func_0"][0].pop("fingerprint", None)
+    verifier.handle_results([discrepancy])
+    assert len(verifier.clusters_collection.requests) == 1
+
+    # another instance claimed the result after the lease expired and verified it again
+    verifier.handle_results([discrepancy])
+    assert len(verifier.verification_results_collection.ids) == 1
+    assert len(verifier.clusters_collection.requests) == 1